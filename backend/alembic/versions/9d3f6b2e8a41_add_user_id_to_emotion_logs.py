@@ -0,0 +1,46 @@
+"""add user_id to emotion_logs
+
+Revision ID: 9d3f6b2e8a41
+Revises: c5e1a8d3f6b2
+Create Date: 2026-10-18 15:42:09.531907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6b2e8a41'
+down_revision: Union[str, None] = 'c5e1a8d3f6b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 感情サマリーの ORDER BY created_at DESC をユーザー単位のインデックスで引けるよう、
+    # 日記の user_id を複製する（既存行は日記から埋めてから NOT NULL にする）
+    op.add_column('emotion_logs', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.execute(
+        'UPDATE emotion_logs SET user_id = '
+        '(SELECT diaries.user_id FROM diaries WHERE diaries.id = emotion_logs.diary_id)'
+    )
+    # SQLite は制約の変更にテーブルの作り直しが必要なので batch で行う
+    with op.batch_alter_table('emotion_logs') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key(
+            'fk_emotion_logs_user_id_users', 'users', ['user_id'], ['id']
+        )
+    op.create_index(
+        'ix_emotion_logs_user_id_created_at_id',
+        'emotion_logs',
+        ['user_id', 'created_at', 'id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emotion_logs_user_id_created_at_id', table_name='emotion_logs')
+    with op.batch_alter_table('emotion_logs') as batch_op:
+        batch_op.drop_constraint('fk_emotion_logs_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,26 @@
+"""add result to jobs
+
+Revision ID: a6d2f9c4e8b3
+Revises: e8f1b4d6a3c7
+Create Date: 2026-10-18 21:42:18.530417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2f9c4e8b3'
+down_revision: Union[str, None] = 'e8f1b4d6a3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('result', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'result')
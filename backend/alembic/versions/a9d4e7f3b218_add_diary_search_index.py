@@ -0,0 +1,66 @@
+"""add diary full-text search index
+
+Revision ID: a9d4e7f3b218
+Revises: f2c8a6e1d7b4
+Create Date: 2026-10-18 17:20:03.771642
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e7f3b218'
+down_revision: Union[str, None] = 'f2c8a6e1d7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # 日本語の文字トライグラム（GIN）インデックス
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_diaries_search_trgm ON diaries "
+            "USING gin ((coalesce(title, '') || ' ' || content) gin_trgm_ops)"
+        )
+    elif dialect == 'sqlite':
+        # FTS5 trigram（外部コンテンツ）+ diaries との同期トリガ
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS diaries_fts USING fts5("
+            "title, content, content='diaries', content_rowid='id', "
+            "tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS diaries_fts_ai AFTER INSERT ON diaries "
+            "BEGIN INSERT INTO diaries_fts(rowid, title, content) "
+            "VALUES (new.id, new.title, new.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS diaries_fts_ad AFTER DELETE ON diaries "
+            "BEGIN INSERT INTO diaries_fts(diaries_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS diaries_fts_au AFTER UPDATE ON diaries "
+            "BEGIN INSERT INTO diaries_fts(diaries_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); "
+            "INSERT INTO diaries_fts(rowid, title, content) "
+            "VALUES (new.id, new.title, new.content); END"
+        )
+        # 既存の日記を索引に取り込む
+        op.execute("INSERT INTO diaries_fts(diaries_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_diaries_search_trgm')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS diaries_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS diaries_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS diaries_fts_ai')
+        op.execute('DROP TABLE IF EXISTS diaries_fts')
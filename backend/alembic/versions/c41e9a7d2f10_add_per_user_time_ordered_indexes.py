@@ -0,0 +1,45 @@
+"""add per-user time-ordered indexes
+
+Revision ID: c41e9a7d2f10
+Revises: 86304d3576c1
+Create Date: 2026-10-18 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e9a7d2f10'
+down_revision: Union[str, None] = '86304d3576c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ユーザー単位の時系列クエリ（一覧・月別・統計）用
+    op.create_index(
+        'ix_diaries_user_id_created_at', 'diaries', ['user_id', 'created_at']
+    )
+    # 管理画面の全件一覧・統計（created_at範囲）用
+    op.create_index('ix_diaries_created_at', 'diaries', ['created_at'])
+    op.create_index(
+        'ix_chat_messages_user_id_created_at',
+        'chat_messages',
+        ['user_id', 'created_at'],
+    )
+    # 外部キー（diary_id）の結合・最新画像取得用
+    op.create_index(
+        'ix_flower_images_diary_id_created_at',
+        'flower_images',
+        ['diary_id', 'created_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flower_images_diary_id_created_at', table_name='flower_images')
+    op.drop_index('ix_chat_messages_user_id_created_at', table_name='chat_messages')
+    op.drop_index('ix_diaries_created_at', table_name='diaries')
+    op.drop_index('ix_diaries_user_id_created_at', table_name='diaries')
@@ -0,0 +1,44 @@
+"""add flower_image_pool table
+
+Revision ID: c5e1a8d3f6b2
+Revises: a6d2f9c4e8b3
+Create Date: 2026-10-18 23:14:52.907136
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1a8d3f6b2'
+down_revision: Union[str, None] = 'a6d2f9c4e8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'flower_image_pool',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('emotion_key', sa.String(length=50), nullable=False),
+        sa.Column('prompt_version', sa.String(length=16), nullable=False),
+        sa.Column('prompt', sa.Text(), nullable=False),
+        sa.Column('blob_name', sa.String(length=500), nullable=False),
+        sa.Column('image_url', sa.String(length=500), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_flower_image_pool_key_version_id',
+        'flower_image_pool',
+        ['emotion_key', 'prompt_version', 'id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_flower_image_pool_key_version_id', table_name='flower_image_pool'
+    )
+    op.drop_table('flower_image_pool')
@@ -0,0 +1,42 @@
+"""add llm_response_cache table
+
+Revision ID: d3a8c5f2e6b1
+Revises: b7e3f1c9a2d5
+Create Date: 2026-10-18 20:12:48.630155
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8c5f2e6b1'
+down_revision: Union[str, None] = 'b7e3f1c9a2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_response_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=50), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(
+        op.f('ix_llm_response_cache_expires_at'),
+        'llm_response_cache',
+        ['expires_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f('ix_llm_response_cache_expires_at'), table_name='llm_response_cache'
+    )
+    op.drop_table('llm_response_cache')
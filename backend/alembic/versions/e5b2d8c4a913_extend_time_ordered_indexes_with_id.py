@@ -0,0 +1,55 @@
+"""extend time-ordered indexes with id for keyset pagination
+
+Revision ID: e5b2d8c4a913
+Revises: c41e9a7d2f10
+Create Date: 2026-10-18 13:05:47.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2d8c4a913'
+down_revision: Union[str, None] = 'c41e9a7d2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (旧インデックス名, 新インデックス名, テーブル, 新カラム)
+# WHERE (created_at, id) < (...) ORDER BY created_at DESC, id DESC を
+# インデックスだけでシークできるよう末尾に id を含める
+_INDEXES = [
+    (
+        'ix_diaries_user_id_created_at',
+        'ix_diaries_user_id_created_at_id',
+        'diaries',
+        ['user_id', 'created_at', 'id'],
+    ),
+    (
+        'ix_diaries_created_at',
+        'ix_diaries_created_at_id',
+        'diaries',
+        ['created_at', 'id'],
+    ),
+    (
+        'ix_chat_messages_user_id_created_at',
+        'ix_chat_messages_user_id_created_at_id',
+        'chat_messages',
+        ['user_id', 'created_at', 'id'],
+    ),
+]
+
+
+def upgrade() -> None:
+    for old_name, new_name, table, columns in _INDEXES:
+        op.create_index(new_name, table, columns)
+        op.drop_index(old_name, table_name=table)
+
+
+def downgrade() -> None:
+    for old_name, new_name, table, columns in _INDEXES:
+        op.create_index(old_name, table, columns[:-1])
+        op.drop_index(new_name, table_name=table)
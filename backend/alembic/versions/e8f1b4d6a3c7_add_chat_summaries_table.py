@@ -0,0 +1,33 @@
+"""add chat_summaries table
+
+Revision ID: e8f1b4d6a3c7
+Revises: d3a8c5f2e6b1
+Create Date: 2026-10-18 22:31:09.448212
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f1b4d6a3c7'
+down_revision: Union[str, None] = 'd3a8c5f2e6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_summaries',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('chat_summaries')
@@ -0,0 +1,151 @@
+"""add user_daily_stats table
+
+Revision ID: f2c8a6e1d7b4
+Revises: e5b2d8c4a913
+Create Date: 2026-10-18 15:42:10.583917
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a6e1d7b4'
+down_revision: Union[str, None] = 'e5b2d8c4a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_daily_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('diary_tension_sum', sa.Integer(), nullable=False),
+        sa.Column('diary_tension_count', sa.Integer(), nullable=False),
+        sa.Column('diary_tension_min', sa.Integer(), nullable=True),
+        sa.Column('diary_tension_max', sa.Integer(), nullable=True),
+        sa.Column('emotion_count', sa.Integer(), nullable=False),
+        sa.Column('emotion_tension_sum', sa.Integer(), nullable=False),
+        sa.Column('low_count', sa.Integer(), nullable=False),
+        sa.Column('normal_count', sa.Integer(), nullable=False),
+        sa.Column('high_count', sa.Integer(), nullable=False),
+        sa.Column('factor_counts', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'date'),
+    )
+    _backfill()
+
+
+def _as_date(value) -> date:
+    # SQLite の DATE() は文字列、Postgres は date を返す
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _backfill() -> None:
+    """既存の日記・感情ログから集計行を作る（app.services.daily_stats と同じ集計）"""
+    bind = op.get_bind()
+    diaries = sa.table(
+        'diaries',
+        sa.column('id', sa.Integer()),
+        sa.column('user_id', sa.Integer()),
+        sa.column('tension', sa.Integer()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    emotion_logs = sa.table(
+        'emotion_logs',
+        sa.column('diary_id', sa.Integer()),
+        sa.column('tension', sa.Integer()),
+        sa.column('tension_level', sa.String()),
+        sa.column('factors', sa.JSON()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    user_daily_stats = sa.table(
+        'user_daily_stats',
+        sa.column('user_id', sa.Integer()),
+        sa.column('date', sa.Date()),
+        sa.column('diary_tension_sum', sa.Integer()),
+        sa.column('diary_tension_count', sa.Integer()),
+        sa.column('diary_tension_min', sa.Integer()),
+        sa.column('diary_tension_max', sa.Integer()),
+        sa.column('emotion_count', sa.Integer()),
+        sa.column('emotion_tension_sum', sa.Integer()),
+        sa.column('low_count', sa.Integer()),
+        sa.column('normal_count', sa.Integer()),
+        sa.column('high_count', sa.Integer()),
+        sa.column('factor_counts', sa.JSON()),
+        sa.column('updated_at', sa.DateTime()),
+    )
+
+    rows: dict[tuple[int, date], dict] = {}
+
+    def row(user_id, day) -> dict:
+        key = (user_id, _as_date(day))
+        if key not in rows:
+            rows[key] = {
+                'user_id': key[0],
+                'date': key[1],
+                'diary_tension_sum': 0,
+                'diary_tension_count': 0,
+                'diary_tension_min': None,
+                'diary_tension_max': None,
+                'emotion_count': 0,
+                'emotion_tension_sum': 0,
+                'low_count': 0,
+                'normal_count': 0,
+                'high_count': 0,
+                'factor_counts': {},
+                'updated_at': datetime.utcnow(),
+            }
+        return rows[key]
+
+    diary_day = sa.func.date(diaries.c.created_at)
+    for user_id, day, total, count, low, high in bind.execute(
+        sa.select(
+            diaries.c.user_id,
+            diary_day,
+            sa.func.coalesce(sa.func.sum(diaries.c.tension), 0),
+            sa.func.count(diaries.c.tension),
+            sa.func.min(diaries.c.tension),
+            sa.func.max(diaries.c.tension),
+        ).group_by(diaries.c.user_id, diary_day)
+    ):
+        stats = row(user_id, day)
+        stats['diary_tension_sum'] = total
+        stats['diary_tension_count'] = count
+        stats['diary_tension_min'] = low
+        stats['diary_tension_max'] = high
+
+    # 要因の出現回数は JSON 配列の集計になるので、ログ単位で数える
+    for user_id, day, tension, level, factors in bind.execute(
+        sa.select(
+            diaries.c.user_id,
+            sa.func.date(emotion_logs.c.created_at),
+            emotion_logs.c.tension,
+            emotion_logs.c.tension_level,
+            emotion_logs.c.factors,
+        ).join(diaries, diaries.c.id == emotion_logs.c.diary_id)
+    ):
+        stats = row(user_id, day)
+        stats['emotion_count'] += 1
+        stats['emotion_tension_sum'] += tension
+        if level in ('low', 'normal', 'high'):
+            stats[f'{level}_count'] += 1
+        for f in factors or []:
+            stats['factor_counts'][f] = stats['factor_counts'].get(f, 0) + 1
+
+    # テンション未入力の日記だけの日は refresh_daily_stats と同じく行を作らない
+    values = [
+        stats
+        for stats in rows.values()
+        if stats['diary_tension_count'] or stats['emotion_count']
+    ]
+    if values:
+        op.bulk_insert(user_daily_stats, values)
+
+
+def downgrade() -> None:
+    op.drop_table('user_daily_stats')
@@ -1,59 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BigInteger, cast, column, func, select, table
 from datetime import datetime, timedelta
-from app.db import SessionLocal
+from app.api.v1.pagination import apply_cursor, split_page
+from app.api.v1.queries import (
+    flower_image_dict,
+    has_flower_image,
+    latest_flower_images,
+)
+from app.core.cache import AsyncTTLCache
+from app.core.config import settings
+from app.db import get_db
 from app.models import User, Diary, FlowerImage
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/users")
 async def get_all_users(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    全ユーザーを取得（管理者用）
+    全ユーザーを取得（管理者用・ID降順）
     """
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    keys = [User.id]
+    result = await db.scalars(apply_cursor(select(User), keys, cursor, limit))
+    users, next_cursor = split_page(result.all(), keys, limit)
+    return {"items": users, "next_cursor": next_cursor}
 
 
 @router.get("/users/{user_id}/diaries")
 async def get_user_diaries(
     user_id: int,
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     特定ユーザーの日記一覧を取得（管理者用）
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
         )
 
-    diaries = (
-        db.query(Diary)
-        .filter(Diary.user_id == user_id)
-        .order_by(Diary.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    keys = [Diary.created_at, Diary.id]
+    rows = await db.scalars(
+        apply_cursor(select(Diary).where(Diary.user_id == user_id), keys, cursor, limit)
     )
+    diaries, next_cursor = split_page(rows.all(), keys, limit)
+    # ページ内の日記の最新画像をまとめて1クエリで取得
+    latest_images = await latest_flower_images(db, [d.id for d in diaries])
 
     result = []
     for diary in diaries:
@@ -67,37 +67,43 @@ async def get_user_diaries(
             "flower_image": None,
         }
 
-        if diary.flower_images:
-            latest_image = diary.flower_images[0]
-            diary_dict["flower_image"] = {
-                "id": latest_image.id,
-                "diary_id": latest_image.diary_id,
-                "image_url": latest_image.image_url,
-                "prompt": latest_image.prompt,
-                "created_at": latest_image.created_at.isoformat(),
-            }
+        latest_image = latest_images.get(diary.id)
+        if latest_image:
+            diary_dict["flower_image"] = flower_image_dict(latest_image)
 
         result.append(diary_dict)
 
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 
 @router.get("/diaries")
 async def get_all_diaries(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     全日記を取得（管理者用）
     """
-    diaries = (
-        db.query(Diary)
-        .order_by(Diary.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    keys = [Diary.created_at, Diary.id]
+    # 画像の有無は EXISTS で判定し、画像行は読み込まない
+    rows = await db.execute(
+        apply_cursor(
+            select(
+                Diary.id,
+                Diary.user_id,
+                Diary.content,
+                Diary.mood,
+                Diary.created_at,
+                Diary.updated_at,
+                has_flower_image,
+            ),
+            keys,
+            cursor,
+            limit,
+        )
     )
+    diaries, next_cursor = split_page(rows.all(), keys, limit)
 
     result = []
     for diary in diaries:
@@ -112,43 +118,59 @@ async def get_all_diaries(
             "mood": diary.mood,
             "created_at": diary.created_at,
             "updated_at": diary.updated_at,
-            "has_image": len(diary.flower_images) > 0,
+            "has_image": bool(diary.has_image),
         }
         result.append(diary_dict)
 
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 
-@router.get("/stats")
-async def get_stats(db: Session = Depends(get_db)):
-    """
-    統計情報を取得（管理者用）
-    """
-    # 総ユーザー数
-    total_users = db.query(func.count(User.id)).scalar()
+# 管理画面のポーリングで毎回集計しないよう短時間キャッシュする
+_stats_cache = AsyncTTLCache(ttl_seconds=settings.ADMIN_STATS_CACHE_TTL)
 
-    # 総日記数
-    total_diaries = db.query(func.count(Diary.id)).scalar()
+# Postgres のカタログ（推定行数の取得用）
+_pg_class = table("pg_class", column("oid"), column("reltuples"))
 
-    # 総画像数
-    total_images = db.query(func.count(FlowerImage.id)).scalar()
 
-    # 今月の日記数
-    now = datetime.utcnow()
-    first_day_of_month = datetime(now.year, now.month, 1)
-    monthly_diaries = (
-        db.query(func.count(Diary.id))
-        .filter(Diary.created_at >= first_day_of_month)
-        .scalar()
+def _estimated_count(table_name: str):
+    """pg_class.reltuples による推定行数（未ANALYZEの -1 は 0 とする）"""
+    return (
+        select(func.greatest(cast(_pg_class.c.reltuples, BigInteger), 0))
+        .where(_pg_class.c.oid == func.to_regclass(table_name))
+        .scalar_subquery()
     )
 
-    # 最近7日間の日記数
+
+async def _load_stats(db: AsyncSession, approximate: bool) -> dict:
+    """5つの統計値を1クエリ（FILTER付き集計）で取得する"""
+    now = datetime.utcnow()
+    first_day_of_month = datetime(now.year, now.month, 1)
     seven_days_ago = now - timedelta(days=7)
-    weekly_diaries = (
-        db.query(func.count(Diary.id))
-        .filter(Diary.created_at >= seven_days_ago)
-        .scalar()
-    )
+
+    monthly = func.count(Diary.id).filter(Diary.created_at >= first_day_of_month)
+    weekly = func.count(Diary.id).filter(Diary.created_at >= seven_days_ago)
+
+    if approximate and db.bind.dialect.name == "postgresql":
+        # 総数はカタログの推定値を使い、diaries は直近分だけをインデックスで走査する
+        stmt = select(
+            _estimated_count("users"),
+            _estimated_count("diaries"),
+            _estimated_count("flower_images"),
+            monthly,
+            weekly,
+        ).where(Diary.created_at >= min(first_day_of_month, seven_days_ago))
+    else:
+        stmt = select(
+            select(func.count(User.id)).scalar_subquery(),
+            func.count(Diary.id),
+            select(func.count(FlowerImage.id)).scalar_subquery(),
+            monthly,
+            weekly,
+        ).select_from(Diary)
+
+    total_users, total_diaries, total_images, monthly_diaries, weekly_diaries = (
+        await db.execute(stmt)
+    ).one()
 
     return {
         "total_users": total_users,
@@ -157,3 +179,18 @@ async def get_stats(db: Session = Depends(get_db)):
         "monthly_diaries": monthly_diaries,
         "weekly_diaries": weekly_diaries,
     }
+
+
+@router.get("/stats")
+async def get_stats(
+    approximate: bool = Query(
+        default=False, description="総数にPostgresの推定行数を使う"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    統計情報を取得（管理者用）
+    """
+    return await _stats_cache.get_or_load(
+        ("stats", approximate), lambda: _load_stats(db, approximate)
+    )
@@ -1,91 +1,194 @@
+import json
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
-from app.db import SessionLocal
-from app.models import User, ChatMessage
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.v1.pagination import apply_cursor, split_page
+from app.db import AsyncSessionLocal, get_db
+from app.models import User, ChatMessage, ChatSummary, Job
 from app.schemas.chat import (
     ChatMessageCreate,
     ChatMessageResponse,
     ChatResponse,
-    ChatMessageHistory,
+    ChatHistoryResponse,
 )
+from app.services.chat_context import build_chat_context
+from app.services.job_handlers import CHAT_SUMMARY_JOB
+from app.services.job_queue import enqueue_job, job_worker
 from app.services.ml import ChatService
+from app.services.ml.chat_service import FALLBACK_REPLY
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def _save_exchange(
+    db: AsyncSession, user_id: int, content: str, reply: str, summarize: bool
+) -> int:
+    """
+    ユーザーメッセージとAIの返答を1回の複数行INSERT（RETURNING）で保存し、返答のIDを返す。
+    文脈に収まらない会話がたまっていれば、要約の更新ジョブも同じトランザクションで登録する。
+    """
+    message_ids = await db.scalars(
+        insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "role": "user", "content": content},
+            {"user_id": user_id, "role": "assistant", "content": reply},
+        ],
+    )
+    ai_message_id = message_ids.all()[-1]
+    if summarize:
+        # 待機中の要約ジョブがあれば、そのジョブが今回の会話も含めて畳み込む
+        pending = await db.scalar(
+            select(Job.id)
+            .where(
+                Job.kind == CHAT_SUMMARY_JOB,
+                Job.status == "pending",
+                Job.payload["user_id"].as_integer() == user_id,
+            )
+            .limit(1)
+        )
+        summarize = pending is None
+    if summarize:
+        enqueue_job(db, CHAT_SUMMARY_JOB, {"user_id": user_id})
+    await db.commit()
+    if summarize:
+        job_worker.notify()
+    return ai_message_id
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @router.post("/", response_model=ChatResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     message: ChatMessageCreate,
     user_id: int = Query(default=1),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # ユーザー確認
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
         )
-    # 会話履歴の取得
-    conversation_history = (
-        [{"role": msg.role, "content": msg.content} for msg in message.history]
-        if message.history
-        else []
-    )
+    # 会話履歴は chat_messages から組み立てる（トークン予算内の直近分＋要約）
+    context = await build_chat_context(db, user_id)
+    # 読み取りのトランザクションを終えて接続をプールに返す（生成中は接続を保持しない）
+    await db.commit()
 
     # AIの返答文を生成
     chat_service = ChatService()
     reply = await chat_service.chat(
-        user_message=message.content, conversation_history=conversation_history
+        user_message=message.content,
+        conversation_history=context.history,
+        summary=context.summary,
     )
 
-    # ユーザーメッセージとAIの返答をDBに保存
-    user_message = ChatMessage(user_id=user_id, role="user", content=message.content)
-    db.add(user_message)
-    db.commit()
-    db.refresh(user_message)
-    ai_message = ChatMessage(user_id=user_id, role="assistant", content=reply)
-    db.add(ai_message)
-    db.commit()
-    db.refresh(ai_message)
+    ai_message_id = await _save_exchange(
+        db, user_id, message.content, reply, context.needs_summary
+    )
+    return ChatResponse(reply=reply, message_id=ai_message_id)
+
+
+@router.post("/stream")
+async def stream_message(message: ChatMessageCreate, user_id: int = Query(default=1)):
+    """
+    AIの返答を Server-Sent Events で逐次返す。
 
-    return ChatResponse(reply=reply, message_id=ai_message.id)
+    - event: delta  … {"content": 返答の断片}
+    - event: done   … {"message_id": 保存したAIメッセージのID}
+    - event: error  … {"detail": エラーメッセージ}
 
+    生成中はDB接続を保持しないよう、get_db は使わずに
+    開始時の確認と完了後の保存でそれぞれ短いセッションを開く。
+    クライアントが切断するとストリーミングのタスクがキャンセルされ、
+    上流の OpenAI ストリームも閉じられる（その場合メッセージは保存しない）。
+    """
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="ユーザーが見つかりません",
+            )
+        context = await build_chat_context(db, user_id)
 
-@router.get("/history", response_model=List[ChatMessageResponse])
+    chat_service = ChatService()
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in chat_service.stream_chat(
+                message.content, context.history, context.summary
+            ):
+                parts.append(delta)
+                yield _sse("delta", {"content": delta})
+        except Exception as e:
+            logger.error(f"OpenAI ストリーミングエラー: {str(e)}", exc_info=True)
+            if not parts:
+                # 1文字も返せていなければ通常の返答と同じ定型文で応答する
+                parts.append(FALLBACK_REPLY)
+                yield _sse("delta", {"content": FALLBACK_REPLY})
+            else:
+                yield _sse("error", {"detail": "返答の生成が途中で中断されました"})
+                return
+
+        async with AsyncSessionLocal() as db:
+            ai_message_id = await _save_exchange(
+                db, user_id, message.content, "".join(parts), context.needs_summary
+            )
+        yield _sse("done", {"message_id": ai_message_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            # プロキシ（nginx等）でのバッファリングを無効化して即時に届ける
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
     user_id: int = Query(default=1),
-    limit: int = Query(default=50, le=100),
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
         )
-    # 会話履歴の取得
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.user_id == user_id)
-        .order_by(ChatMessage.created_at.desc())
-        .limit(limit)
-        .all()
+    # 会話履歴の取得（新しい順）
+    keys = [ChatMessage.created_at, ChatMessage.id]
+    result = await db.scalars(
+        apply_cursor(
+            select(ChatMessage).where(ChatMessage.user_id == user_id),
+            keys,
+            cursor,
+            limit,
+        )
+    )
+    messages, next_cursor = split_page(result.all(), keys, limit)
+    return ChatHistoryResponse(
+        items=[ChatMessageResponse.from_orm(msg) for msg in messages],
+        next_cursor=next_cursor,
     )
-    return [ChatMessageResponse.from_orm(msg) for msg in messages]
 
 
 @router.delete("/history", status_code=status.HTTP_204_NO_CONTENT)
 async def clear_chat_histrory(
-    user_id: int = Query(default=1), db: Session = Depends(get_db)
+    user_id: int = Query(default=1), db: AsyncSession = Depends(get_db)
 ):
-    db.query(ChatMessage).filter(ChatMessage.user_id == user_id).delete()
-    db.commit()
+    await db.execute(delete(ChatMessage).where(ChatMessage.user_id == user_id))
+    await db.execute(delete(ChatSummary).where(ChatSummary.user_id == user_id))
+    await db.commit()
     return None
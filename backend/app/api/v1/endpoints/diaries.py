@@ -1,30 +1,36 @@
-from datetime import date, datetime
+from datetime import datetime
 from calendar import monthrange
-import asyncio
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from app.db import SessionLocal
-from app.models import Diary, User, FlowerImage
-from app.schemas.diary import DiaryCreate, DiaryUpdate, DiaryResponse
-from app.services.ml import PromptBuilder, ImageGenerator, AICommentService
+from app.api.v1.pagination import apply_cursor, split_page
+from app.api.v1.queries import flower_image_dict, latest_flower_images
+from app.core.config import settings
+from app.db import get_db
+from app.models import Diary, User, UserDailyStats
+from app.schemas.diary import (
+    DiaryCreate,
+    DiaryUpdate,
+    DiaryResponse,
+    DiaryListResponse,
+    DiarySearchResponse,
+)
+from app.services.daily_stats import refresh_daily_stats
+from app.services.diary_search import search_diaries
+from app.services.flower_pool import assign_pooled_flower
+from app.services.job_handlers import AI_COMMENT_JOB, FLOWER_IMAGE_JOB
+from app.services.job_queue import enqueue_job, job_worker
 
 router = APIRouter(prefix="/diaries", tags=["diaries"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/", response_model=DiaryResponse, status_code=status.HTTP_201_CREATED)
 async def create_diary(
     diary: DiaryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記を作成し、画像を生成する
@@ -35,7 +41,7 @@ async def create_diary(
 
     # ユーザーの存在確認 - 一時的にuser_id=1を使用
     user_id = 1  # TODO: リクエストボディから取得
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ユーザーが見つかりません"
@@ -51,75 +57,26 @@ async def create_diary(
         photo_url=diary.photo_url,
     )
     db.add(db_diary)
-    db.commit()
-    db.refresh(db_diary)
-
-    # AIコメント生成はバックグラウンドで実行（レスポンスをブロックしない）
-    async def _generate_ai_comment(
-        diary_id: int, content: str, photo_url: str | None, mood: str | None
-    ):
-        bg_db = SessionLocal()
-        try:
-            comment_service = AICommentService()
-            comment = await comment_service.generate_comment(
-                diary_content=content,
-                photo_url=photo_url,
-                mood=mood,
-            )
-            bg_diary = bg_db.query(Diary).filter(Diary.id == diary_id).first()
-            if bg_diary:
-                bg_diary.ai_comment = comment
-                bg_db.commit()
-        except Exception as e:
-            print(f"AIコメント生成エラー: {str(e)}")
-        finally:
-            bg_db.close()
-
-    asyncio.create_task(
-        _generate_ai_comment(
-            db_diary.id,
-            db_diary.content,
-            db_diary.photo_url,
-            db_diary.mood,
+    await db.flush()
+    # 日別ロールアップを同じトランザクションで更新
+    await refresh_daily_stats(db, user_id, db_diary.created_at.date())
+    # AIコメント生成はジョブとして同じトランザクションで登録し、ワーカーが非同期に実行する
+    enqueue_job(db, AI_COMMENT_JOB, {"diary_id": db_diary.id})
+    # 花画像は感情カテゴリのプールから割り当てる（空ならジョブで生成する）
+    flower_image = None
+    if settings.FLOWER_POOL_ENABLED:
+        flower_image = await assign_pooled_flower(
+            db, db_diary.id, db_diary.content, db_diary.mood
         )
-    )
+        if flower_image is None:
+            enqueue_job(
+                db, FLOWER_IMAGE_JOB, {"diary_id": db_diary.id, "user_id": user_id}
+            )
+    # id・created_at はフラッシュ時に確定しているので再取得（refresh）は不要
+    await db.commit()
+    job_worker.notify()
 
-    # 画像生成（Vertex AI） ※一時無効化
-    flower_image_data = None
-    # try:
-    #     # プロンプト生成（OpenAI APIで感情分析）
-    #     prompt_builder = PromptBuilder()
-    #     prompt = prompt_builder.analyze_emotion_and_build_prompt(
-    #         diary_content=db_diary.content, mood=db_diary.mood
-    #     )
-    #
-    #     # 画像生成（Vertex AI）
-    #     generator = ImageGenerator()
-    #     image_url = await generator.generate_flower_image(
-    #         prompt=prompt, diary_id=db_diary.id
-    #     )
-    #
-    #     # 画像情報をDB保存
-    #     flower_image = FlowerImage(
-    #         diary_id=db_diary.id,
-    #         image_url=image_url,
-    #         prompt=prompt,
-    #     )
-    #     db.add(flower_image)
-    #     db.commit()
-    #     db.refresh(flower_image)
-    #
-    #     flower_image_data = {
-    #         "id": flower_image.id,
-    #         "diary_id": flower_image.diary_id,
-    #         "image_url": flower_image.image_url,
-    #         "prompt": flower_image.prompt,
-    #         "created_at": flower_image.created_at.isoformat(),
-    #     }
-    #
-    # except Exception as e:
-    #     # 画像生成失敗してもエラーにしない（日記は保存済み）
-    #     print(f"画像生成エラー（日記は保存されました）: {str(e)}")
+    flower_image_data = flower_image_dict(flower_image) if flower_image else None
 
     return DiaryResponse(
         id=db_diary.id,
@@ -136,37 +93,36 @@ async def create_diary(
     )
 
 
-@router.get("/", response_model=List[DiaryResponse])
+@router.get("/", response_model=DiaryListResponse)
 async def list_diaries(
-    skip: int = 0,
-    limit: int = 20,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    ユーザーの日記一覧を取得
+    ユーザーの日記一覧を取得（新しい順・カーソルページネーション）
     """
     # TODO: 認証実装後はトークンから取得
     user_id = 1
-    diaries = (
-        db.query(Diary)
-        .filter(Diary.user_id == user_id)
-        .order_by(Diary.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    keys = [Diary.created_at, Diary.id]
+    result = await db.scalars(
+        apply_cursor(select(Diary).where(Diary.user_id == user_id), keys, cursor, limit)
     )
-    return diaries
+    diaries, next_cursor = split_page(result.all(), keys, limit)
+    return DiaryListResponse(items=diaries, next_cursor=next_cursor)
 
 
 @router.get("/count", response_model=dict)
 async def get_diary_count(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記の合計数を取得（花の成長進捗用）
     """
     user_id = 1  # TODO: 認証実装後修正
-    count = db.query(Diary).filter(Diary.user_id == user_id).count()
+    count = await db.scalar(
+        select(func.count(Diary.id)).where(Diary.user_id == user_id)
+    )
     return {"count": count}
 
 
@@ -174,7 +130,7 @@ async def get_diary_count(
 async def get_diaries_by_month(
     year: int = Query(..., ge=2000, le=2100, description="年"),
     month: int = Query(..., ge=1, le=12, description="月"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     指定した年月の日記一覧を取得（カレンダー用）
@@ -188,31 +144,87 @@ async def get_diaries_by_month(
     _, last_day = monthrange(year, month)
     end_date = datetime(year, month, last_day, 23, 59, 59)
 
-    diaries = (
-        db.query(Diary)
-        .filter(
+    result = await db.scalars(
+        select(Diary)
+        .where(
             Diary.user_id == user_id,
             Diary.created_at >= start_date,
             Diary.created_at <= end_date,
         )
         .order_by(Diary.created_at.asc())
-        .all()
     )
-    return diaries
+    return result.all()
+
+
+@router.get("/statistics", response_model=dict)
+async def get_tension_statistics(
+    year: int = Query(..., ge=2000, le=2100, description="年"),
+    month: int = Query(..., ge=1, le=12, description="月"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    指定した年月のテンション統計（平均・最大・最小）を返す
+    """
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+
+    # 日別ロールアップ（最大31行）から集計する
+    tension_sum, tension_count, maximum, minimum = (
+        await db.execute(
+            select(
+                func.sum(UserDailyStats.diary_tension_sum),
+                func.sum(UserDailyStats.diary_tension_count),
+                func.max(UserDailyStats.diary_tension_max),
+                func.min(UserDailyStats.diary_tension_min),
+            ).where(
+                UserDailyStats.user_id == 1,  # TODO: 認証実装後はトークンから取得
+                UserDailyStats.date >= start_date.date(),
+                UserDailyStats.date < end_date.date(),
+            )
+        )
+    ).one()
+
+    return {
+        "average_tension": (tension_sum / tension_count if tension_count else None),
+        "max_tension": maximum,
+        "min_tension": minimum,
+    }
+
+
+@router.get("/search", response_model=DiarySearchResponse)
+async def search_diary(
+    q: str = Query(
+        ..., min_length=1, max_length=100, description="検索語（空白区切りでAND）"
+    ),
+    limit: int = Query(default=20, ge=1, le=50),
+    offset: int = Query(default=0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    日記のタイトル・本文を全文検索（関連度順）
+    """
+    # TODO: 認証実装後はトークンから取得
+    user_id = 1
+    diaries = await search_diaries(db, user_id, q, limit=limit, offset=offset)
+    next_offset = offset + limit if len(diaries) > limit else None
+    return DiarySearchResponse(items=diaries[:limit], next_offset=next_offset)
 
 
 @router.get("/{diary_id}", response_model=DiaryResponse)
 async def get_diary(
     diary_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記詳細を取得
     """
     # TODO: 認証実装後はトークンから取得
     user_id = 1
-    diary = (
-        db.query(Diary).filter(Diary.id == diary_id, Diary.user_id == user_id).first()
+    diary = await db.scalar(
+        select(Diary).where(Diary.id == diary_id, Diary.user_id == user_id)
     )
 
     if not diary:
@@ -231,65 +243,27 @@ async def get_diary(
         flower_image=None,
     )
 
-    if diary.flower_images:
-        # 最新の画像を取得
-        latest_image = diary.flower_images[0]
-        response.flower_image = {
-            "id": latest_image.id,
-            "diary_id": latest_image.diary_id,
-            "image_url": latest_image.image_url,
-            "prompt": latest_image.prompt,
-            "created_at": latest_image.created_at.isoformat(),
-        }
+    # 最新の画像を取得
+    latest_image = (await latest_flower_images(db, [diary.id])).get(diary.id)
+    if latest_image:
+        response.flower_image = flower_image_dict(latest_image)
 
     return response
 
 
-@router.get("/statistics", response_model=dict)
-async def get_tension_statistics(
-    year: int = Query(..., ge=2000, le=2100, description="年"),
-    month: int = Query(..., ge=1, le=12, description="月"),
-    db: Session = Depends(get_db),
-):
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
-
-    diaries = (
-        db.query(Diary)
-        .filter(
-            Diary.user_id == 1,  # TODO: 認証実装後はトークンから取得
-            Diary.created_at >= start_date,
-            Diary.created_at < end_date,
-            Diary.tension != None,  # tensionがnullでないものを対象
-        )
-        .all()
-    )
-
-    return {
-        "average_tension": (
-            sum(d.tension for d in diaries) / len(diaries) if diaries else None
-        ),
-        "max_tension": max(d.tension for d in diaries) if diaries else None,
-        "min_tension": min(d.tension for d in diaries) if diaries else None,
-    }
-
-
 @router.put("/{diary_id}", response_model=DiaryResponse)
 async def update_diary(
     diary_id: int,
     diary_update: DiaryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記を更新
     """
     # TODO: 認証実装後はトークンから取得
     user_id = 1
-    diary = (
-        db.query(Diary).filter(Diary.id == diary_id, Diary.user_id == user_id).first()
+    diary = await db.scalar(
+        select(Diary).where(Diary.id == diary_id, Diary.user_id == user_id)
     )
 
     if not diary:
@@ -303,8 +277,8 @@ async def update_diary(
     if diary_update.mood is not None:
         diary.mood = diary_update.mood
 
-    db.commit()
-    db.refresh(diary)
+    await db.commit()
+    await db.refresh(diary)
 
     return diary
 
@@ -312,15 +286,18 @@ async def update_diary(
 @router.delete("/{diary_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_diary(
     diary_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記を削除
     """
     # TODO: 認証実装後はトークンから取得
     user_id = 1
-    diary = (
-        db.query(Diary).filter(Diary.id == diary_id, Diary.user_id == user_id).first()
+    # カスケード削除対象の関連を先に読み込む（AsyncSessionでは遅延ロード不可）
+    diary = await db.scalar(
+        select(Diary)
+        .options(selectinload(Diary.flower_images), selectinload(Diary.emotion_log))
+        .where(Diary.id == diary_id, Diary.user_id == user_id)
     )
 
     if not diary:
@@ -328,7 +305,14 @@ async def delete_diary(
             status_code=status.HTTP_404_NOT_FOUND, detail="日記が見つかりません"
         )
 
-    db.delete(diary)
-    db.commit()
+    # 日記と紐づく感情ログの日付のロールアップを再集計する
+    affected_days = {diary.created_at.date()}
+    if diary.emotion_log:
+        affected_days.add(diary.emotion_log.created_at.date())
+
+    await db.delete(diary)
+    for day in affected_days:
+        await refresh_daily_stats(db, user_id, day)
+    await db.commit()
 
     return None
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 
-from app.db import SessionLocal
-from app.models import Diary, EmotionLog
+from app.core.singleflight import input_hash, single_flight
+from app.db import get_db
+from app.models import Diary, EmotionLog, UserDailyStats
+from app.services.daily_stats import refresh_daily_stats
 from app.services.ml import (
     EmotionAnalysisService,
     classify_tension_level,
@@ -15,14 +20,6 @@ from app.services.ml import (
 router = APIRouter(prefix="/emotions", tags=["emotions"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # ---------- Request / Response schemas ----------
 
 
@@ -71,85 +68,130 @@ class EmotionSummary(BaseModel):
 )
 async def create_emotion_log(
     body: EmotionLogCreate,
-    db: Session = Depends(get_db),
+    regenerate: bool = Query(default=False),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記に紐づく感情ログを保存し、low/high の場合はAI分析を実行する
+    同じ内容の再送信では保存済みの分析を再利用する（regenerate=true で生成し直す）
     """
     # 日記の存在確認
-    diary = db.query(Diary).filter(Diary.id == body.diary_id).first()
+    diary = await db.get(Diary, body.diary_id)
     if not diary:
         raise HTTPException(status_code=404, detail="日記が見つかりません")
 
-    # 既存ログがあれば上書き
-    existing = db.query(EmotionLog).filter(EmotionLog.diary_id == body.diary_id).first()
-    if existing:
-        db.delete(existing)
-        db.commit()
-
     tension_level = classify_tension_level(body.tension)
+    # 読み取りのトランザクションを終えて接続をプールに返す（分析中は接続を保持しない）
+    await db.commit()
 
     # AI分析（low/high のみ）
     analysis = None
     try:
         service = EmotionAnalysisService()
-        analysis = await service.analyze(
-            tension=body.tension,
-            tension_level=tension_level,
-            factors=body.factors,
-            diary_content=diary.content,
+        # 同じ内容の分析が実行中なら、その結果を待って共有する
+        analysis = await single_flight.do(
+            "emotion_analysis",
+            (
+                diary.id,
+                input_hash(body.tension, body.factors, diary.content, regenerate),
+            ),
+            lambda: service.analyze(
+                tension=body.tension,
+                tension_level=tension_level,
+                factors=body.factors,
+                diary_content=diary.content,
+                bypass_cache=regenerate,
+                # 共有の処理はこのリクエストより長く続きうる（キャンセルされても止めない）ので、
+                # リクエストのセッションは渡さず、キャッシュは短いセッションで読み書きする
+                db=None,
+            ),
         )
     except Exception as e:
         print(f"感情分析エラー（ログは保存します）: {e}")
 
-    log = EmotionLog(
+    # 既存ログがあれば上書き（INSERT ... ON CONFLICT (diary_id) DO UPDATE ... RETURNING）
+    # created_at は初回記録時のまま残す
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(EmotionLog).values(
         diary_id=body.diary_id,
+        user_id=diary.user_id,
         tension=body.tension,
         tension_level=tension_level,
         factors=body.factors,
         analysis=analysis,
     )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EmotionLog.diary_id],
+        set_={
+            "tension": stmt.excluded.tension,
+            "tension_level": stmt.excluded.tension_level,
+            "factors": stmt.excluded.factors,
+            "analysis": stmt.excluded.analysis,
+        },
+    )
+    log = await db.scalar(
+        stmt.returning(EmotionLog),
+        execution_options={"populate_existing": True},
+    )
+    await refresh_daily_stats(db, diary.user_id, log.created_at.date())
+    await db.commit()
     return log
 
 
 @router.get("/summary", response_model=EmotionSummary)
-def get_emotion_summary(
-    db: Session = Depends(get_db),
+async def get_emotion_summary(
+    limit: int | None = Query(
+        default=None, ge=1, description="logs を直近の件数に絞る（省略時は全件）"
+    ),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     全期間の感情ログサマリーを返す（可視化ダッシュボード用）
+    集計は日別ロールアップ（1日1行）から行い、logs は古い順で返す
+    （limit を指定すると直近 limit 件のみ）
     """
     user_id = 1  # TODO: 認証実装後修正
 
-    logs = (
-        db.query(EmotionLog)
-        .join(Diary)
-        .filter(Diary.user_id == user_id)
-        .order_by(EmotionLog.created_at.asc())
-        .all()
+    daily_rows = await db.scalars(
+        select(UserDailyStats).where(
+            UserDailyStats.user_id == user_id, UserDailyStats.emotion_count > 0
+        )
     )
-
-    if not logs:
+    level_counts = {"low": 0, "normal": 0, "high": 0}
+    factor_totals: dict[str, int] = {}
+    total = 0
+    tension_sum = 0
+    for daily in daily_rows:
+        total += daily.emotion_count
+        tension_sum += daily.emotion_tension_sum
+        level_counts["low"] += daily.low_count
+        level_counts["normal"] += daily.normal_count
+        level_counts["high"] += daily.high_count
+        for k, v in (daily.factor_counts or {}).items():
+            factor_totals[k] = factor_totals.get(k, 0) + v
+
+    if total == 0:
         return EmotionSummary(
             logs=[],
             total=0,
             avg_tension=None,
             factor_counts={},
-            level_counts={"low": 0, "normal": 0, "high": 0},
+            level_counts=level_counts,
         )
 
-    # 要因カウント
-    factor_counts: dict[str, int] = {k: 0 for k in EMOTION_FACTORS}
-    level_counts = {"low": 0, "normal": 0, "high": 0}
-
-    for log in logs:
-        for f in log.factors or []:
-            if f in factor_counts:
-                factor_counts[f] += 1
-        level_counts[log.tension_level] = level_counts.get(log.tension_level, 0) + 1
+    # 要因カウント（マスタに存在するキーのみ）
+    factor_counts = {
+        k: v for k, v in factor_totals.items() if k in EMOTION_FACTORS and v > 0
+    }
+
+    # ix_emotion_logs_user_id_created_at_id を新しい順にたどる（limit 件で止まる）
+    result = await db.scalars(
+        select(EmotionLog)
+        .where(EmotionLog.user_id == user_id)
+        .order_by(EmotionLog.created_at.desc(), EmotionLog.id.desc())
+        .limit(limit)
+    )
+    logs = list(reversed(result.all()))
 
     return EmotionSummary(
         logs=[
@@ -162,9 +204,9 @@ def get_emotion_summary(
             )
             for log in logs
         ],
-        total=len(logs),
-        avg_tension=round(sum(l.tension for l in logs) / len(logs), 1),
-        factor_counts={k: v for k, v in factor_counts.items() if v > 0},
+        total=total,
+        avg_tension=round(tension_sum / total, 1),
+        factor_counts=factor_counts,
         level_counts=level_counts,
     )
 
@@ -1,39 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db import SessionLocal
-from app.models import Diary, FlowerImage
-from app.schemas.flower import FlowerImageResponse, FlowerGenerationRequest
-from app.services.ml import ImageGenerator, PromptBuilder
+from app.core.singleflight import single_flight
+from app.db import AsyncSessionLocal, get_db
+from app.models import Diary, FlowerImage, Job
+from app.schemas.flower import (
+    FlowerImageResponse,
+    FlowerGenerationRequest,
+    FlowerJobResponse,
+)
+from app.services.job_handlers import FLOWER_IMAGE_JOB
+from app.services.job_queue import enqueue_job, job_worker
 
 router = APIRouter(prefix="/flowers", tags=["flowers"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# jobs.status → 公開する状態名
+_JOB_STATUSES = {
+    "pending": "queued",
+    "running": "running",
+    "done": "done",
+    "failed": "failed",
+}
+
+
+def _job_response(job: Job) -> FlowerJobResponse:
+    result = job.result or {}
+    return FlowerJobResponse(
+        job_id=job.id,
+        diary_id=job.payload["diary_id"],
+        status=_JOB_STATUSES[job.status],
+        flower_image_id=result.get("flower_image_id"),
+        image_url=result.get("image_url"),
+        error=job.last_error if job.status == "failed" else None,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
 
 
 @router.post(
-    "/generate", response_model=FlowerImageResponse, status_code=status.HTTP_201_CREATED
+    "/generate",
+    response_model=FlowerJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def generate_flower_image(
     request: FlowerGenerationRequest,
     user_id: int,  # TODO: 認証実装後はトークンから取得
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    日記から花の画像を生成
+    日記から花の画像を生成するジョブを登録する
+    生成はワーカーで行い、状態は GET /flowers/jobs/{job_id} で確認する
     """
     # 日記の存在確認
-    diary = (
-        db.query(Diary)
-        .filter(Diary.id == request.diary_id, Diary.user_id == user_id)
-        .first()
+    diary = await db.scalar(
+        select(Diary).where(Diary.id == request.diary_id, Diary.user_id == user_id)
     )
 
     if not diary:
@@ -41,49 +63,73 @@ async def generate_flower_image(
             status_code=status.HTTP_404_NOT_FOUND, detail="日記が見つかりません"
         )
 
-    # プロンプト生成
-    prompt_builder = PromptBuilder()
-    prompt = prompt_builder.analyze_emotion_and_build_prompt(
-        diary_content=diary.content, mood=diary.mood
+    # 同時に届いた同じ日記のリクエストは1つにまとめる
+    diary_id = diary.id
+    return await single_flight.do(
+        "flower_generate",
+        diary_id,
+        lambda: _find_or_enqueue(diary_id, user_id),
     )
 
-    # 画像生成（Vertex AI）
-    try:
-        generator = ImageGenerator()
-        image_url = await generator.generate_flower_image(
-            prompt=prompt, diary_id=diary.id
+
+async def _find_or_enqueue(diary_id: int, user_id: int) -> FlowerJobResponse:
+    """同じ日記の生成が待機中・実行中ならそのジョブを、なければ新しく登録したジョブを返す"""
+    async with AsyncSessionLocal() as db:
+        job = await db.scalar(
+            select(Job)
+            .where(
+                Job.kind == FLOWER_IMAGE_JOB,
+                Job.status.in_(["pending", "running"]),
+                Job.payload["diary_id"].as_integer() == diary_id,
+            )
+            .order_by(Job.id.desc())
+            .limit(1)
         )
-    except Exception as e:
+        if job is None:
+            job = enqueue_job(
+                db, FLOWER_IMAGE_JOB, {"diary_id": diary_id, "user_id": user_id}
+            )
+            await db.commit()
+            await db.refresh(job)
+            job_worker.notify()
+
+        return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=FlowerJobResponse)
+async def get_flower_job(
+    job_id: int,
+    user_id: int,  # TODO: 認証実装後はトークンから取得
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    花画像の生成ジョブの状態（queued / running / done / failed）と、完了後の画像URLを取得
+    """
+    job = await db.get(Job, job_id)
+    if (
+        job is None
+        or job.kind != FLOWER_IMAGE_JOB
+        or job.payload.get("user_id") != user_id
+    ):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"画像生成に失敗しました: {str(e)}",
+            status_code=status.HTTP_404_NOT_FOUND, detail="ジョブが見つかりません"
         )
 
-    # DB保存
-    flower_image = FlowerImage(
-        diary_id=diary.id,
-        image_url=image_url,
-        prompt=prompt,
-    )
-    db.add(flower_image)
-    db.commit()
-    db.refresh(flower_image)
-
-    return flower_image
+    return _job_response(job)
 
 
 @router.get("/diary/{diary_id}", response_model=List[FlowerImageResponse])
 async def get_diary_flowers(
     diary_id: int,
     user_id: int,  # TODO: 認証実装後はトークンから取得
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     日記に紐づく花画像一覧を取得
     """
     # 日記の存在確認
-    diary = (
-        db.query(Diary).filter(Diary.id == diary_id, Diary.user_id == user_id).first()
+    diary = await db.scalar(
+        select(Diary).where(Diary.id == diary_id, Diary.user_id == user_id)
     )
 
     if not diary:
@@ -92,30 +138,28 @@ async def get_diary_flowers(
         )
 
     # 花画像取得
-    flower_images = (
-        db.query(FlowerImage)
-        .filter(FlowerImage.diary_id == diary_id)
+    flower_images = await db.scalars(
+        select(FlowerImage)
+        .where(FlowerImage.diary_id == diary_id)
         .order_by(FlowerImage.created_at.desc())
-        .all()
     )
 
-    return flower_images
+    return flower_images.all()
 
 
 @router.get("/{flower_id}", response_model=FlowerImageResponse)
 async def get_flower_image(
     flower_id: int,
     user_id: int,  # TODO: 認証実装後はトークンから取得
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     花画像の詳細を取得
     """
-    flower_image = (
-        db.query(FlowerImage)
+    flower_image = await db.scalar(
+        select(FlowerImage)
         .join(Diary)
-        .filter(FlowerImage.id == flower_id, Diary.user_id == user_id)
-        .first()
+        .where(FlowerImage.id == flower_id, Diary.user_id == user_id)
     )
 
     if not flower_image:
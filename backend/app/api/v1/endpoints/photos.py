@@ -3,13 +3,11 @@
 POST /api/v1/photos/upload → GCS保存 → 公開URL返却
 """
 
-import io
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, status
-from google.cloud import storage
 
-from app.core.config import settings
+from app.services.storage import get_object_store
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
@@ -46,12 +44,9 @@ async def upload_photo(file: UploadFile = File(...)):
     blob_name = f"user-photos/{timestamp}.{ext}"
 
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(settings.GCS_BUCKET_NAME)
-        blob = bucket.blob(blob_name)
-        blob.upload_from_file(io.BytesIO(file_bytes), content_type=file.content_type)
-        blob.make_public()
-        public_url = blob.public_url
+        public_url = await get_object_store().upload(
+            blob_name, file_bytes, file.content_type
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
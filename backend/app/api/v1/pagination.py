@@ -0,0 +1,63 @@
+"""
+カーソル（keyset）ページネーション用のユーティリティ
+
+OFFSET ではなく最後に返した行のキー（例: (created_at, id)）を
+不透明なカーソル文字列として返し、次ページは
+WHERE (created_at, id) < (...) でインデックスから直接シークする。
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+
+
+def encode_cursor(values: list) -> str:
+    """キー値のリストを URL セーフなカーソル文字列にエンコードする"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """カーソル文字列を各カラムの型に合わせたキー値のリストに戻す"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("cursor size mismatch")
+
+        values = []
+        for column, value in zip(columns, payload):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="カーソルが不正です"
+        )
+
+
+def apply_cursor(stmt: Select, columns: list, cursor: str | None, limit: int) -> Select:
+    """
+    columns の降順に並べ、cursor より後ろの行を limit + 1 件取得する文を返す。
+    余分な1件は次ページの有無判定に使う。
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        stmt = stmt.where(tuple_(*columns) < tuple_(*values))
+    return stmt.order_by(*(c.desc() for c in columns)).limit(limit + 1)
+
+
+def split_page(rows: list, columns: list, limit: int) -> tuple[list, str | None]:
+    """apply_cursor の結果を (ページの行, 次ページのカーソル) に分ける"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, c.key) for c in columns])
@@ -0,0 +1,53 @@
+"""
+複数エンドポイントで共有する関連データ取得クエリ
+
+日記ごとに関連を遅延ロードすると N+1 クエリになるため、
+ページ内の日記IDをまとめて1クエリで取得する。
+"""
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Diary, FlowerImage
+
+# 日記に花画像が1枚以上あるか（画像行は読み込まない）
+has_flower_image = exists().where(FlowerImage.diary_id == Diary.id).label("has_image")
+
+
+async def latest_flower_images(
+    db: AsyncSession, diary_ids: list[int]
+) -> dict[int, FlowerImage]:
+    """日記IDごとの最新の花画像を1クエリで取得する"""
+    if not diary_ids:
+        return {}
+
+    ranked = (
+        select(
+            FlowerImage.id,
+            func.row_number()
+            .over(
+                partition_by=FlowerImage.diary_id,
+                order_by=(FlowerImage.created_at.desc(), FlowerImage.id.desc()),
+            )
+            .label("rn"),
+        )
+        .where(FlowerImage.diary_id.in_(diary_ids))
+        .subquery()
+    )
+    images = await db.scalars(
+        select(FlowerImage).join(
+            ranked, (ranked.c.id == FlowerImage.id) & (ranked.c.rn == 1)
+        )
+    )
+    return {image.diary_id: image for image in images}
+
+
+def flower_image_dict(image: FlowerImage) -> dict:
+    """レスポンス用の flower_image 辞書に変換する"""
+    return {
+        "id": image.id,
+        "diary_id": image.diary_id,
+        "image_url": image.image_url,
+        "prompt": image.prompt,
+        "created_at": image.created_at.isoformat(),
+    }
@@ -0,0 +1,48 @@
+"""
+インプロセスの TTL キャッシュ
+
+期限切れのキーに同時アクセスがあった場合、再計算するのは最初の1リクエストだけで、
+残りはその結果を待って共有する（single-flight）。
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class AsyncTTLCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        # key -> (有効期限(monotonic), 値)
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    def _get_fresh(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """キャッシュが有効ならそれを返し、期限切れなら loader で再計算する"""
+        hit, value = self._get_fresh(key)
+        if hit:
+            return value
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # 待っている間に他のリクエストが更新していればそれを使う
+            hit, value = self._get_fresh(key)
+            if hit:
+                return value
+            value = await loader()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            return value
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
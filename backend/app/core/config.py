@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -18,9 +19,127 @@ class Settings:
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # 共有HTTPクライアント（コネクションプール）設定
+    OPENAI_HTTP2: bool = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    OPENAI_KEEPALIVE_EXPIRY: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    # リクエスト全体のタイムアウト（秒）: 既定値とチャット（対話）用
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_CHAT_TIMEOUT: float = float(os.getenv("OPENAI_CHAT_TIMEOUT", "30"))
+
+    # OpenAI 呼び出しのリミッタ（モデルごと）
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_RPM: float = float(os.getenv("LLM_RPM", "500"))
+    LLM_TPM: float = float(os.getenv("LLM_TPM", "200000"))
+    # モデル別の上書き（例: {"gpt-4o": {"concurrency": 4, "rpm": 500, "tpm": 30000}}）
+    LLM_MODEL_LIMITS: dict = json.loads(os.getenv("LLM_MODEL_LIMITS", "{}"))
+    # 対話用に確保しておく同時実行枠（バックグラウンドはこの分を使えない）
+    LLM_INTERACTIVE_RESERVED: int = int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))
+    # 実行枠を待つ時間の上限（秒）
+    LLM_INTERACTIVE_QUEUE_TIMEOUT: float = float(
+        os.getenv("LLM_INTERACTIVE_QUEUE_TIMEOUT", "10")
+    )
+    LLM_BACKGROUND_QUEUE_TIMEOUT: float = float(
+        os.getenv("LLM_BACKGROUND_QUEUE_TIMEOUT", "120")
+    )
+    # 429・一時的なエラーの再試行（OpenAI SDK の再試行は使わず、リミッタが枠を取り直して再試行する）
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+
+    # チャットの文脈（サーバ側で chat_messages から組み立てる）
+    # 要約＋直近の会話に使うトークン数の上限
+    CHAT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+    # 文脈の組み立てで読むメッセージ数の上限
+    CHAT_CONTEXT_MAX_MESSAGES: int = int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", "200"))
+    # 予算から溢れた未要約のメッセージがこの件数に達したら要約を更新する
+    CHAT_SUMMARY_MIN_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_MIN_MESSAGES", "6"))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+
+    # OpenAI 応答キャッシュ（同じ内容の再送信・リトライではLLMを呼ばない）
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    # DBに保存した応答の有効期間（秒）
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+    # Vertex AI / Cloud Storage のブロッキングな SDK 呼び出しを実行するスレッド数
+    IMAGE_SDK_WORKERS: int = int(os.getenv("IMAGE_SDK_WORKERS", "4"))
+
+    # 外部サービスの切り替え（fake / local はオフラインでの負荷試験・開発用）
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")  # openai / fake
+    IMAGE_PROVIDER: str = os.getenv("IMAGE_PROVIDER", "vertex")  # vertex / fake
+    STORAGE_PROVIDER: str = os.getenv("STORAGE_PROVIDER", "gcs")  # gcs / local
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "./local_storage")
+    LOCAL_STORAGE_BASE_URL: str = os.getenv(
+        "LOCAL_STORAGE_BASE_URL", "http://localhost:8000/local-storage"
+    )
+    # fake の応答待ち時間（平均・秒）と分布（fixed / uniform / lognormal）
+    FAKE_LLM_LATENCY: float = float(os.getenv("FAKE_LLM_LATENCY", "0.8"))
+    FAKE_IMAGE_LATENCY: float = float(os.getenv("FAKE_IMAGE_LATENCY", "4"))
+    FAKE_LATENCY_DISTRIBUTION: str = os.getenv("FAKE_LATENCY_DISTRIBUTION", "lognormal")
+    # uniform では平均に対する幅の割合、lognormal では対数の標準偏差
+    FAKE_LATENCY_JITTER: float = float(os.getenv("FAKE_LATENCY_JITTER", "0.5"))
+    # 429 / 500 を返す割合
+    FAKE_ERROR_RATE: float = float(os.getenv("FAKE_ERROR_RATE", "0"))
+    # stream=True のときの断片の間隔（秒）
+    FAKE_STREAM_CHUNK_DELAY: float = float(os.getenv("FAKE_STREAM_CHUNK_DELAY", "0.03"))
+    FAKE_SEED: int = int(os.getenv("FAKE_SEED", "0"))
+
+    # prompts/ のファイルの更新を確認する間隔（秒）。更新されていれば再起動なしで反映する
+    PROMPT_CHECK_INTERVAL: float = float(os.getenv("PROMPT_CHECK_INTERVAL", "2"))
+    # true ならバックグラウンドのスレッドで確認する（リクエスト処理中はファイルに触れない）
+    PROMPT_WATCH: bool = os.getenv("PROMPT_WATCH", "true").lower() == "true"
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+pysqlite:///./local.db")
 
+    # Database connection pool
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Cloud SQL がアイドル接続を切る前に作り直す（秒）
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # 管理画面の統計キャッシュ（秒）
+    ADMIN_STATS_CACHE_TTL: float = float(os.getenv("ADMIN_STATS_CACHE_TTL", "30"))
+
+    # SQLite（ローカル用）の接続時PRAGMA
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+    # バックグラウンドジョブ（AIコメント生成など）
+    # APIプロセス内でワーカーを動かすか（別プロセスで python -m app.services.job_queue を使う場合は false）
+    JOB_WORKER_ENABLED: bool = os.getenv("JOB_WORKER_ENABLED", "true").lower() == "true"
+    JOB_CONCURRENCY: int = int(os.getenv("JOB_CONCURRENCY", "4"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_DELAY: float = float(os.getenv("JOB_RETRY_BASE_DELAY", "2"))
+    JOB_RETRY_MAX_DELAY: float = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+    # 実行中のジョブはこの間隔で locked_at を更新する（ハートビート）
+    JOB_HEARTBEAT_INTERVAL: float = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+    # locked_at の更新がこの秒数途絶えたジョブはワーカー停止とみなして再取得する
+    JOB_LOCK_TIMEOUT: float = float(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+    JOB_SHUTDOWN_GRACE: float = float(os.getenv("JOB_SHUTDOWN_GRACE", "10"))
+    # done / failed のジョブを残す日数（ワーカーが定期的に削除する）
+    JOB_RETENTION_DAYS: float = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+    JOB_RETENTION_SWEEP_INTERVAL: float = float(
+        os.getenv("JOB_RETENTION_SWEEP_INTERVAL", "3600")
+    )
+    # 花画像の生成ジョブを同時に実行する件数（ほかのジョブの枠を占有しないように）
+    FLOWER_JOB_CONCURRENCY: int = int(os.getenv("FLOWER_JOB_CONCURRENCY", "2"))
+
+    # 感情カテゴリごとに事前生成しておく花画像のプール
+    # 有効にすると日記作成時にプールから画像を割り当てる（なければ生成ジョブを登録する）
+    FLOWER_POOL_ENABLED: bool = (
+        os.getenv("FLOWER_POOL_ENABLED", "false").lower() == "true"
+    )
+    # 感情カテゴリごとに用意しておく枚数
+    FLOWER_POOL_SIZE: int = int(os.getenv("FLOWER_POOL_SIZE", "10"))
+    # 残りがこの枚数を下回ったら補充ジョブを登録する
+    FLOWER_POOL_LOW_WATERMARK: int = int(os.getenv("FLOWER_POOL_LOW_WATERMARK", "3"))
+
 
 settings = Settings()
@@ -0,0 +1,101 @@
+"""
+ブロッキングな SDK 呼び出し用の専用スレッドプール
+
+Vertex AI / Cloud Storage の SDK は同期 API なので、async 関数から直接呼ぶと
+生成・アップロードの数秒間イベントループ全体が止まる。
+専用の（上限付きの）スレッドプールで実行し、呼び出し元はその完了を待つ。
+
+処理の種類（stage）ごとに、プールの空き待ち時間と実行時間を記録する。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_wait_seconds": self.wait_total / self.count if self.count else 0.0,
+            "max_wait_seconds": self.wait_max,
+            "avg_run_seconds": self.run_total / self.count if self.count else 0.0,
+            "max_run_seconds": self.run_max,
+        }
+
+
+class BlockingExecutor:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: ThreadPoolExecutor | None = None
+        self._stats: dict[str, _StageStats] = {}
+        self.pending = 0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+        return self._pool
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """fn をプールのスレッドで実行し、結果を返す"""
+        stats = self._stats.setdefault(stage, _StageStats())
+        submitted = time.perf_counter()
+        timings = {}
+
+        def call():
+            started = time.perf_counter()
+            timings["wait"] = started - submitted
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings["run"] = time.perf_counter() - started
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_pool(), call
+            )
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            self.pending -= 1
+            # 実行前にキャンセルされた場合は記録しない
+            if "run" in timings:
+                stats.count += 1
+                stats.wait_total += timings["wait"]
+                stats.wait_max = max(stats.wait_max, timings["wait"])
+                stats.run_total += timings["run"]
+                stats.run_max = max(stats.run_max, timings["run"])
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def snapshot(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            # 実行中＋空き待ち
+            "pending": self.pending,
+            "stages": {stage: s.snapshot() for stage, s in self._stats.items()},
+        }
+
+
+# Vertex AI（画像生成）・Cloud Storage（アップロード）用
+sdk_executor = BlockingExecutor("gcp-sdk", settings.IMAGE_SDK_WORKERS)
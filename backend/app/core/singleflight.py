@@ -0,0 +1,55 @@
+"""
+同一処理の同時実行をまとめる（single-flight）
+
+ダブルクリックやクライアントのリトライで、同じ日記に対する同じ生成処理が
+同時に複数走ると、そのぶん OpenAI / Imagen を重複して呼んでしまう。
+(処理名, 日記ID, 入力のハッシュ) が同じ呼び出しが実行中なら、
+新しく実行せずに実行中の結果を待って共有する。
+
+共有する処理は呼び出し元とは別のタスクで動かすため、
+最初の呼び出し元が切断（キャンセル）されても残りの呼び出し元には結果が届く。
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def input_hash(*parts: Any) -> str:
+    """入力値から決まるハッシュ（キーの一部に使う）"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # 処理名 -> {"executed": 実行した回数, "coalesced": 相乗りした回数}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    async def do(
+        self, operation: str, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """同じ (operation, key) の処理が実行中ならその結果を待ち、なければ fn() を実行する"""
+        stats = self._stats.setdefault(operation, {"executed": 0, "coalesced": 0})
+        flight_key = (operation, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            stats["executed"] += 1
+            task = asyncio.create_task(fn())
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        else:
+            stats["coalesced"] += 1
+        # 待っている側がキャンセルされても共有の処理は止めない
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "operations": {op: dict(stats) for op, stats in self._stats.items()},
+        }
+
+
+single_flight = SingleFlight()
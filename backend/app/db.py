@@ -1,7 +1,14 @@
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
 
 load_dotenv()
 
@@ -10,7 +17,134 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     DATABASE_URL = "sqlite+pysqlite:///./local.db"
 
-engine = create_engine(DATABASE_URL)
+# 非同期ドライバへの対応表（Postgres → asyncpg, SQLite → aiosqlite）
+_ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """同期用のDB URLを非同期ドライバ用のURLに変換する"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+class PoolMetrics:
+    """コネクションプールのチェックアウト待ち時間などを記録する"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_checkouts = 0
+
+    def record_checkout(self, wait_seconds: float, overflow: int):
+        self.checkouts += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        if overflow > 0:
+            self.overflow_checkouts += 1
+
+    def snapshot(self, pool) -> dict:
+        status = {"pool_class": type(pool).__name__}
+        # QueuePool 系のみ持つ統計値
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            getter = getattr(pool, name, None)
+            if callable(getter):
+                status[name] = getter()
+        return {
+            **status,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    チェックアウトにかかった時間（空きを待つ時間・新しい接続を作る時間）を
+    pool_metrics に記録するプール。接続は使う時点で取り出される（セッションの遅延取得のまま）。
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.checkout_timeouts += 1
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started, self.overflow())
+        return connection
+
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    """Settings からコネクションプールの設定を組み立てる"""
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            # インメモリSQLiteは単一接続プールなのでサイズ指定しない
+            return {}
+    if is_async:
+        # チェックアウト待ち時間を記録するキュープールを使う
+        # （aiosqlite の既定は NullPool で、サイズ指定が効かない）
+        options["poolclass"] = MeteredAsyncQueuePool
+    return {
+        **options,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """ローカル負荷試験で実運用に近い並行性になるよう接続ごとにPRAGMAを設定する"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+# 同期エンジン（Alembic・create_all・バッチ処理用）
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# 非同期エンジン（APIエンドポイント用）
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL), **_engine_options(DATABASE_URL, is_async=True)
+)
+
+if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
+
+
+async def get_db():
+    """リクエスト単位の AsyncSession を提供する共通Dependency"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,13 +1,53 @@
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import Base, engine, SessionLocal
+from .db import AsyncSessionLocal, Base, async_engine, engine, get_db, pool_metrics
 from .models import User
 from .api.v1 import api_router
+from .core.config import settings
+from .core.singleflight import single_flight
+from .services import job_handlers  # noqa: F401  ジョブハンドラの登録
+from .services.flower_pool import pool_status, request_refill_all
+from .services.job_queue import job_metrics, job_worker
+from .core.executor import sdk_executor
+from .services.ml.image_generator import close_image_generator, init_image_generator
+from .services.ml.llm_limiter import llm_limiter
+from .services.ml.openai_client import close_openai_client, init_openai_client
+from .services.ml.response_cache import response_cache
+from prompts import prompt_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # OpenAIのHTTPコネクションプールをプロセス全体で共有する
+    init_openai_client()
+    # Vertex AI の初期化・モデル取得は起動時に済ませておく
+    await init_image_generator()
+    prompt_registry.check_interval = settings.PROMPT_CHECK_INTERVAL
+    if settings.PROMPT_WATCH:
+        prompt_registry.start_watcher()
+    if settings.FLOWER_POOL_ENABLED:
+        # 足りないカテゴリの花画像プールをワーカーに補充させる
+        async with AsyncSessionLocal() as db:
+            await request_refill_all(db)
+            await db.commit()
+    if settings.JOB_WORKER_ENABLED:
+        job_worker.start()
+    yield
+    if settings.JOB_WORKER_ENABLED:
+        await job_worker.stop()
+    prompt_registry.stop_watcher()
+    close_image_generator()
+    await close_openai_client()
 
-app = FastAPI(title="Flower Diary API", version="1.0.0")
+
+app = FastAPI(title="Flower Diary API", version="1.0.0", lifespan=lifespan)
 
 # CORS設定
 origins = os.getenv(
@@ -29,13 +69,14 @@ if os.getenv("RUN_MIGRATIONS", "false").lower() == "true":
 # API v1ルーターを追加
 app.include_router(api_router, prefix="/api/v1")
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# ローカルのオブジェクトストアに保存した画像を配信する（GCS の代わり）
+if settings.STORAGE_PROVIDER == "local":
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(
+        "/local-storage",
+        StaticFiles(directory=settings.LOCAL_STORAGE_DIR),
+        name="local-storage",
+    )
 
 
 @app.get("/health")
@@ -43,16 +84,64 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/internal/db-pool")
+def db_pool_status():
+    """DBコネクションプールの利用状況（内部監視用）"""
+    return pool_metrics.snapshot(async_engine.pool)
+
+
+@app.get("/internal/jobs")
+async def job_queue_status(db: AsyncSession = Depends(get_db)):
+    """バックグラウンドジョブのキュー深さ・待ち時間（内部監視用）"""
+    return await job_metrics.snapshot(db)
+
+
+@app.get("/internal/llm")
+def llm_limiter_status():
+    """OpenAI 呼び出しの実行枠・待ち時間・レート制限の状況（内部監視用）"""
+    return llm_limiter.snapshot()
+
+
+@app.get("/internal/llm-cache")
+def llm_cache_status():
+    """OpenAI 応答キャッシュのヒット率（内部監視用）"""
+    return response_cache.snapshot()
+
+
+@app.get("/internal/single-flight")
+def single_flight_status():
+    """同時実行をまとめた生成処理の実行回数・相乗り回数（内部監視用）"""
+    return single_flight.snapshot()
+
+
+@app.get("/internal/image-sdk")
+def image_sdk_status():
+    """Vertex AI / GCS の SDK 呼び出しのスレッド待ち時間・実行時間（内部監視用）"""
+    return sdk_executor.snapshot()
+
+
+@app.get("/internal/prompts")
+def prompt_status():
+    """読み込み済みプロンプトのバージョン（内容のハッシュ）（内部監視用）"""
+    return prompt_registry.snapshot()
+
+
+@app.get("/internal/flower-pool")
+async def flower_pool_status(db: AsyncSession = Depends(get_db)):
+    """感情カテゴリごとの事前生成した花画像の残り枚数（内部監視用）"""
+    return await pool_status(db)
+
+
 @app.post("/users")
-def create_user(name: str, db: Session = Depends(get_db)):
+async def create_user(name: str, db: AsyncSession = Depends(get_db)):
     user = User(name=name)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return {"id": user.id, "name": user.name}
 
 
 @app.get("/users")
-def list_users(db: Session = Depends(get_db)):
-    users = db.query(User).order_by(User.id).all()
+async def list_users(db: AsyncSession = Depends(get_db)):
+    users = (await db.scalars(select(User).order_by(User.id))).all()
     return [{"id": u.id, "name": u.name} for u in users]
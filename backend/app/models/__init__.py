@@ -8,5 +8,21 @@ from app.models.diary import Diary
 from app.models.flower_image import FlowerImage
 from app.models.chat_message import ChatMessage
 from app.models.emotion_log import EmotionLog
+from app.models.user_daily_stats import UserDailyStats
+from app.models.job import Job
+from app.models.llm_cache_entry import LLMCacheEntry
+from app.models.chat_summary import ChatSummary
+from app.models.flower_pool_image import FlowerPoolImage
 
-__all__ = ["User", "Diary", "FlowerImage", "ChatMessage", "EmotionLog"]
+__all__ = [
+    "User",
+    "Diary",
+    "FlowerImage",
+    "ChatMessage",
+    "EmotionLog",
+    "UserDailyStats",
+    "Job",
+    "LLMCacheEntry",
+    "ChatSummary",
+    "FlowerPoolImage",
+]
@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import Integer, Text, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class ChatSummary(Base):
+    """ユーザーごとの古い会話の要約（チャットの文脈に含めきれない分）"""
+
+    __tablename__ = "chat_summaries"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    # この id までの chat_messages が要約に含まれている
+    last_message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
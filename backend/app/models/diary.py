@@ -1,13 +1,25 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey, Integer, Text as SAText
+from sqlalchemy import (
+    String,
+    Text,
+    DateTime,
+    ForeignKey,
+    Integer,
+    Index,
+    Text as SAText,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 
 
 class Diary(Base):
     __tablename__ = "diaries"
+    __table_args__ = (
+        Index("ix_diaries_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_diaries_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
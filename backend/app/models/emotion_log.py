@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, JSON
+from sqlalchemy import String, Text, Integer, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 
@@ -10,11 +10,16 @@ class EmotionLog(Base):
     """テンション値・感情要因・AI分析結果を記録するテーブル"""
 
     __tablename__ = "emotion_logs"
+    __table_args__ = (
+        Index("ix_emotion_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     diary_id: Mapped[int] = mapped_column(
         ForeignKey("diaries.id"), nullable=False, unique=True
     )
+    # 日記の user_id の複製（ユーザー単位の時系列クエリを diaries と結合せずにインデックスで引く）
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     tension: Mapped[int] = mapped_column(Integer, nullable=False)
     # 感情レベル: "low" | "normal" | "high"
     tension_level: Mapped[str] = mapped_column(String(10), nullable=False)
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 
 
 class FlowerImage(Base):
     __tablename__ = "flower_images"
+    __table_args__ = (
+        Index("ix_flower_images_diary_id_created_at", "diary_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     diary_id: Mapped[int] = mapped_column(ForeignKey("diaries.id"), nullable=False)
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class FlowerPoolImage(Base):
+    """感情カテゴリごとに事前生成しておく未使用の花画像（使われたら行を削除する）"""
+
+    __tablename__ = "flower_image_pool"
+    __table_args__ = (
+        # 感情カテゴリ・プロンプトの版ごとに古い順で1件取り出すためのインデックス
+        Index(
+            "ix_flower_image_pool_key_version_id", "emotion_key", "prompt_version", "id"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # flower_prompts.txt のセクション名（joy, sadness, ..., default）
+    emotion_key: Mapped[str] = mapped_column(String(50), nullable=False)
+    # 生成に使ったプロンプトのハッシュ（プロンプトが変わったら使わない）
+    prompt_version: Mapped[str] = mapped_column(String(16), nullable=False)
+    prompt: Mapped[str] = mapped_column(Text, nullable=False)
+    # ストレージ上のオブジェクト名（無効化したときの削除用）
+    blob_name: Mapped[str] = mapped_column(String(500), nullable=False)
+    image_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import String, Text, Integer, DateTime, JSON, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class Job(Base):
+    """バックグラウンド処理のジョブキュー（AIコメント生成など）"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # ワーカーが実行可能なジョブを古い順に取り出すためのインデックス
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # ジョブの種類（例: "ai_comment"）
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    # ハンドラに渡す引数（JSONオブジェクト: {"diary_id": 1}）
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    # 状態: "pending" | "running" | "done" | "failed"
+    status: Mapped[str] = mapped_column(String(10), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    # この時刻以降に実行する（リトライ時は指数バックオフで後ろにずらす）
+    run_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    # 実行中のワーカーが取得した時刻（一定時間更新がなければ再取得される）
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # ハンドラが返した結果（例: {"flower_image_id": 1, "image_url": "..."}）
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class LLMCacheEntry(Base):
+    """OpenAI 応答のキャッシュ（リクエスト内容のハッシュ → 応答テキスト）"""
+
+    __tablename__ = "llm_response_cache"
+
+    # sha256(モデル・メッセージ・max_tokens) の16進表現
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(50), nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
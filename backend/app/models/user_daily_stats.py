@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import Date, DateTime, ForeignKey, Integer, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class UserDailyStats(Base):
+    """ユーザー×日付ごとのテンション・感情ログ集計（ダッシュボード用ロールアップ）"""
+
+    __tablename__ = "user_daily_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    date: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+    # 日記のテンション値（diaries.tension）の集計
+    diary_tension_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    diary_tension_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    diary_tension_min: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    diary_tension_max: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # 感情ログ（emotion_logs）の集計
+    emotion_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    emotion_tension_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    low_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    normal_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    high_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # 要因キー → 出現回数（JSONオブジェクト: {"sleep": 2, ...}）
+    factor_counts: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime,
+        default=dt.datetime.utcnow,
+        onupdate=dt.datetime.utcnow,
+        nullable=False,
+    )
@@ -12,7 +12,9 @@ class ChatMessageHistory(BaseModel):
 
 class ChatMessageCreate(BaseModel):
     content: str
-    history: Optional[List[ChatMessageHistory]] = []  # localStorageからの履歴
+    # 非推奨: 会話履歴はサーバ側で chat_messages から組み立てるため無視する
+    # （古いクライアントとの互換のため受け付けだけ残している）
+    history: Optional[List[ChatMessageHistory]] = []
 
 
 class ChatMessageResponse(BaseModel):
@@ -31,3 +33,10 @@ class ChatResponse(BaseModel):
 
     reply: str
     message_id: int  # 保存されたメッセージID
+
+
+class ChatHistoryResponse(BaseModel):
+    """会話履歴（新しい順）と次ページ用カーソル"""
+
+    items: List[ChatMessageResponse]
+    next_cursor: Optional[str] = None
@@ -34,3 +34,14 @@ class DiaryResponse(DiaryBase):
     ai_comment: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class DiaryListResponse(BaseModel):
+    items: list[DiaryResponse]
+    next_cursor: str | None = None
+
+
+class DiarySearchResponse(BaseModel):
+    items: list[DiaryResponse]
+    # 関連度順のため offset でページングする
+    next_offset: int | None = None
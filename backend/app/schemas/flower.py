@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Literal
 from pydantic import BaseModel, ConfigDict
 
 
@@ -14,3 +15,16 @@ class FlowerImageResponse(BaseModel):
 
 class FlowerGenerationRequest(BaseModel):
     diary_id: int
+
+
+class FlowerJobResponse(BaseModel):
+    """花画像の生成ジョブの状態"""
+
+    job_id: int
+    diary_id: int
+    status: Literal["queued", "running", "done", "failed"]
+    flower_image_id: int | None = None
+    image_url: str | None = None
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,253 @@
+"""
+AIコメント・感情分析が欠けている行のバックフィル
+
+ワーカー停止や OpenAI の障害で ai_comment / analysis が NULL のまま残った行を、
+サーバサイドカーソルで少しずつ読みながら並列に生成し直す。
+
+- 同時に生成する件数は --concurrency で制限する（OpenAI のレート制限は llm_limiter が守る）
+- 結果は --batch-size 件ごとにまとめて UPDATE・コミットする
+- 処理済みの位置（id）をチェックポイントファイルに保存し、中断しても続きから再開できる
+- 失敗した行は NULL のまま残るので、--reset で最初から流し直せば再試行される
+
+    python -m app.services.backfill [--target comments|analyses|all]
+        [--concurrency N] [--batch-size N] [--checkpoint PATH] [--reset]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import Select, bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal, async_engine
+from app.models import Diary, EmotionLog
+from app.services.ml import AICommentService, EmotionAnalysisService
+from app.services.ml.llm_limiter import Priority
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = ".backfill_checkpoint.json"
+
+
+class _Target:
+    """バックフィル対象（NULL の行を読むクエリ・1行の生成・保存先カラム）"""
+
+    def __init__(
+        self,
+        name: str,
+        query: Callable[[int], Select],
+        generate: Callable[[object], Awaitable[str | None]],
+        table,
+        column: str,
+    ):
+        self.name = name
+        self.query = query
+        self.generate = generate
+        # 他の経路で埋まった行は上書きしない
+        self.statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c[column].is_(None))
+            .values({column: bindparam("b_value")})
+        )
+
+
+def _comment_target() -> _Target:
+    service = AICommentService(priority=Priority.BACKGROUND)
+
+    def query(after_id: int) -> Select:
+        return (
+            select(Diary.id, Diary.content, Diary.photo_url, Diary.mood)
+            .where(Diary.ai_comment.is_(None), Diary.id > after_id)
+            .order_by(Diary.id)
+        )
+
+    async def generate(row) -> str | None:
+        return await service.generate_comment(
+            diary_content=row.content, photo_url=row.photo_url, mood=row.mood
+        )
+
+    return _Target("comments", query, generate, Diary.__table__, "ai_comment")
+
+
+def _analysis_target() -> _Target:
+    service = EmotionAnalysisService(priority=Priority.BACKGROUND)
+
+    def query(after_id: int) -> Select:
+        # normal は分析しない仕様なので対象外
+        return (
+            select(
+                EmotionLog.id,
+                EmotionLog.tension,
+                EmotionLog.tension_level,
+                EmotionLog.factors,
+                Diary.content,
+            )
+            .join(Diary, Diary.id == EmotionLog.diary_id)
+            .where(
+                EmotionLog.analysis.is_(None),
+                EmotionLog.tension_level.in_(["low", "high"]),
+                EmotionLog.id > after_id,
+            )
+            .order_by(EmotionLog.id)
+        )
+
+    async def generate(row) -> str | None:
+        return await service.analyze(
+            tension=row.tension,
+            tension_level=row.tension_level,
+            factors=row.factors or [],
+            diary_content=row.content,
+        )
+
+    return _Target("analyses", query, generate, EmotionLog.__table__, "analysis")
+
+
+class _Checkpoint:
+    """対象ごとの処理済み id をJSONファイルに保存する"""
+
+    def __init__(self, path: str, reset: bool):
+        self.path = path
+        self.positions: dict[str, int] = {}
+        if not reset and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.positions = json.load(f)
+
+    def get(self, name: str) -> int:
+        return self.positions.get(name, 0)
+
+    def save(self, name: str, position: int):
+        self.positions[name] = position
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.positions, f)
+        os.replace(tmp, self.path)
+
+
+class _Run:
+    """1つの対象のバックフィル（読み出し・並列生成・バッチ保存）"""
+
+    def __init__(
+        self,
+        target: _Target,
+        checkpoint: _Checkpoint,
+        concurrency: int,
+        batch_size: int,
+    ):
+        self.target = target
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.in_flight: dict[asyncio.Task, int] = {}
+        self.results: list[dict] = []
+        self.last_dispatched = checkpoint.get(target.name)
+        self.updated = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    async def run(self) -> None:
+        async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+            stream = await read_db.stream(
+                self.target.query(self.last_dispatched).execution_options(
+                    yield_per=self.batch_size
+                )
+            )
+            async for row in stream:
+                while len(self.in_flight) >= self.concurrency:
+                    await self._collect(write_db, asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(self.target.generate(row))
+                self.in_flight[task] = row.id
+                self.last_dispatched = row.id
+            while self.in_flight:
+                await self._collect(write_db, asyncio.ALL_COMPLETED)
+            await self._flush(write_db)
+
+    async def _collect(self, write_db: AsyncSession, return_when) -> None:
+        done, _ = await asyncio.wait(self.in_flight, return_when=return_when)
+        for task in done:
+            row_id = self.in_flight.pop(task)
+            try:
+                value = task.result()
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"{self.target.name} id={row_id} の生成に失敗: {str(e)}")
+                continue
+            if value:
+                self.results.append({"b_id": row_id, "b_value": value})
+        if len(self.results) >= self.batch_size:
+            await self._flush(write_db)
+
+    async def _flush(self, write_db: AsyncSession) -> None:
+        if self.results:
+            result = await write_db.execute(self.target.statement, self.results)
+            await write_db.commit()
+            self.updated += result.rowcount
+            self.results = []
+        # 生成中の行より前はすべて保存済みなので、そこまでを再開位置にする
+        position = (
+            min(self.in_flight.values()) - 1 if self.in_flight else self.last_dispatched
+        )
+        self.checkpoint.save(self.target.name, position)
+        self._report()
+
+    def _report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        done = self.updated + self.failed
+        print(
+            f"[{self.target.name}] 更新 {self.updated} 件 / 失敗 {self.failed} 件 "
+            f"({done / elapsed if elapsed else 0.0:.1f} 件/秒, {elapsed:.1f}s)"
+        )
+
+
+async def backfill(
+    targets: list[str],
+    concurrency: int = 8,
+    batch_size: int = 100,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    reset: bool = False,
+) -> None:
+    checkpoint = _Checkpoint(checkpoint_path, reset)
+    factories = {"comments": _comment_target, "analyses": _analysis_target}
+    for name in targets:
+        await _Run(factories[name](), checkpoint, concurrency, batch_size).run()
+
+
+async def _main(args) -> None:
+    from app.services.ml.openai_client import close_openai_client
+
+    targets = ["comments", "analyses"] if args.target == "all" else [args.target]
+    try:
+        await backfill(
+            targets,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            checkpoint_path=args.checkpoint,
+            reset=args.reset,
+        )
+    finally:
+        await close_openai_client()
+        # プールの接続（aiosqlite はスレッド）を閉じないとプロセスが終了しない
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="NULL の ai_comment / analysis をバックフィルする"
+    )
+    parser.add_argument(
+        "--target", choices=["comments", "analyses", "all"], default="all"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="チェックポイントを無視して最初から処理する",
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,157 @@
+"""
+チャットの文脈（会話履歴）をサーバ側で組み立てる
+
+クライアントから履歴を受け取らず、chat_messages から新しい順に
+CHAT_CONTEXT_TOKEN_BUDGET に収まるだけ取り出す。
+収まらない古い会話はユーザーごとの要約（chat_summaries）に畳み込み、
+要約＋直近の会話を文脈として渡すことで、1ターンあたりのプロンプトを一定に保つ。
+
+要約の更新は chat_summary ジョブとしてバックグラウンドで差分だけ行う。
+"""
+
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import ChatMessage, ChatSummary
+from app.services.ml import ChatService
+from app.services.ml.llm_limiter import count_tokens
+
+
+@dataclass
+class ChatContext:
+    summary: str | None = None
+    # 古い順の {"role", "content"}
+    history: list[dict] = field(default_factory=list)
+    # 予算に収まらず要約もされていないメッセージがたまっている
+    needs_summary: bool = False
+
+
+async def _split_unsummarized(
+    db: AsyncSession,
+    user_id: int,
+    summary: ChatSummary | None,
+    budget: int,
+    limit: int | None = None,
+) -> tuple[list[ChatMessage], list[ChatMessage]]:
+    """
+    要約済みより後のメッセージ（新しい順に最大 limit 件）を
+    (予算に収まる直近分, 溢れた古い分) に分ける。どちらも古い順。
+    """
+    after_id = summary.last_message_id if summary else 0
+    stmt = (
+        select(ChatMessage)
+        .where(ChatMessage.user_id == user_id, ChatMessage.id > after_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = (await db.scalars(stmt)).all()
+
+    used = 0
+    recent = []
+    for i, message in enumerate(rows):
+        used += count_tokens(message.content)
+        if used > budget:
+            return list(reversed(recent)), list(reversed(rows[i:]))
+        recent.append(message)
+    return list(reversed(recent)), []
+
+
+async def build_chat_context(db: AsyncSession, user_id: int) -> ChatContext:
+    """要約＋予算に収まる直近の会話を返す"""
+    summary = await db.get(ChatSummary, user_id)
+    budget = settings.CHAT_CONTEXT_TOKEN_BUDGET
+    if summary:
+        budget -= count_tokens(summary.summary)
+
+    # 予算を超えたかどうかと、溢れた件数が要約の閾値に届くかが分かれば十分
+    recent, overflow = await _split_unsummarized(
+        db, user_id, summary, budget, limit=settings.CHAT_CONTEXT_MAX_MESSAGES
+    )
+    return ChatContext(
+        summary=summary.summary if summary else None,
+        history=[{"role": m.role, "content": m.content} for m in recent],
+        needs_summary=len(overflow) >= settings.CHAT_SUMMARY_MIN_MESSAGES,
+    )
+
+
+async def refresh_chat_summary(db: AsyncSession, user_id: int) -> bool:
+    """
+    要約に含まれていない古い会話を要約に畳み込む。更新したら True を返す。
+
+    直近の会話は予算の半分（最大 CHAT_CONTEXT_MAX_MESSAGES 件）だけ残し、
+    続く数ターンは要約し直さずに済むようにする。
+    1回に畳み込むのは古い方から予算1つ分までで、読むのもその分だけなので、
+    未要約の会話が大量にある場合は False が返るまで繰り返し呼ぶ。
+    """
+    summary = await db.get(ChatSummary, user_id)
+    after_id = summary.last_message_id if summary else 0
+    # 残す直近の会話を決める（新しい順に文脈と同じ件数までしか読まない）
+    recent, overflow = await _split_unsummarized(
+        db,
+        user_id,
+        summary,
+        settings.CHAT_CONTEXT_TOKEN_BUDGET // 2,
+        limit=settings.CHAT_CONTEXT_MAX_MESSAGES,
+    )
+    if recent:
+        keep_from = recent[0].id
+    elif overflow:
+        keep_from = overflow[-1].id + 1
+    else:
+        return False
+
+    # 畳み込むのは古い方からの1チャンク分だけなので、その分だけ読む
+    oldest = (
+        await db.scalars(
+            select(ChatMessage)
+            .where(
+                ChatMessage.user_id == user_id,
+                ChatMessage.id > after_id,
+                ChatMessage.id < keep_from,
+            )
+            .order_by(ChatMessage.created_at, ChatMessage.id)
+            .limit(settings.CHAT_CONTEXT_MAX_MESSAGES)
+        )
+    ).all()
+    if not oldest:
+        return False
+
+    chunk, used = [], 0
+    for message in oldest:
+        used += count_tokens(message.content)
+        if chunk and used > settings.CHAT_CONTEXT_TOKEN_BUDGET:
+            break
+        chunk.append(message)
+
+    previous = summary.summary if summary else None
+    messages = [{"role": m.role, "content": m.content} for m in chunk]
+    last_message_id = chunk[-1].id
+    # OpenAI の応答待ちの間はトランザクションを開いたままにしない
+    await db.commit()
+
+    new_summary = await ChatService().summarize(previous, messages)
+
+    # 並行して走った要約で、より新しい位置まで進んでいれば上書きしない
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(ChatSummary).values(
+        user_id=user_id, summary=new_summary, last_message_id=last_message_id
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ChatSummary.user_id],
+            set_={
+                "summary": stmt.excluded.summary,
+                "last_message_id": stmt.excluded.last_message_id,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=ChatSummary.last_message_id < stmt.excluded.last_message_id,
+        )
+    )
+    await db.commit()
+    return True
@@ -0,0 +1,181 @@
+"""
+ユーザー×日付の集計ロールアップ（user_daily_stats）の更新サービス
+
+日記・感情ログを書き込むエンドポイントは、同じトランザクション内で
+refresh_daily_stats() を呼び、影響を受けた日の行だけを再集計する。
+1日分の行数は小さいため、min/max を含めて常に正しい値を保てる。
+
+ずれが生じた場合は全件を作り直す（行ごとに置き換えるので、実行中も読み取りは止まらない）:
+    python -m app.services.daily_stats [--user-id USER_ID]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Diary, EmotionLog, UserDailyStats
+
+
+def _day_range(day: date) -> tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def _as_date(value) -> date:
+    # SQLite の DATE() は文字列、Postgres は date を返す
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+async def _lock_daily_stats(
+    db: AsyncSession, user_id: int, day: date
+) -> UserDailyStats:
+    """
+    ユーザー・日付の行を（なければ空で作って）ロックする。
+    同じ日を同時に更新するトランザクションはここで順番待ちになり、
+    後のトランザクションは先にコミットされた日記・ログも含めて再集計する。
+    """
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    await db.execute(
+        insert(UserDailyStats)
+        .values(
+            user_id=user_id,
+            date=day,
+            diary_tension_sum=0,
+            diary_tension_count=0,
+            emotion_count=0,
+            emotion_tension_sum=0,
+            low_count=0,
+            normal_count=0,
+            high_count=0,
+            factor_counts={},
+            updated_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(
+            index_elements=[UserDailyStats.user_id, UserDailyStats.date]
+        )
+    )
+    # SQLite では FOR UPDATE は無視され、書き込みはDB全体で直列になる
+    return await db.scalar(
+        select(UserDailyStats)
+        .where(UserDailyStats.user_id == user_id, UserDailyStats.date == day)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+
+async def refresh_daily_stats(db: AsyncSession, user_id: int, day: date) -> None:
+    """
+    指定したユーザー・日付のロールアップ行を生データから再集計する。
+    コミットは呼び出し側のトランザクションに任せる。
+    """
+    await db.flush()
+    stats = await _lock_daily_stats(db, user_id, day)
+    start, end = _day_range(day)
+
+    tension_sum, tension_count, tension_min, tension_max = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(Diary.tension), 0),
+                func.count(Diary.tension),
+                func.min(Diary.tension),
+                func.max(Diary.tension),
+            ).where(
+                Diary.user_id == user_id,
+                Diary.created_at >= start,
+                Diary.created_at < end,
+            )
+        )
+    ).one()
+
+    logs = (
+        await db.execute(
+            select(EmotionLog.tension, EmotionLog.tension_level, EmotionLog.factors)
+            .join(Diary)
+            .where(
+                Diary.user_id == user_id,
+                EmotionLog.created_at >= start,
+                EmotionLog.created_at < end,
+            )
+        )
+    ).all()
+
+    level_counts = {"low": 0, "normal": 0, "high": 0}
+    factor_counts: dict[str, int] = {}
+    for _, level, factors in logs:
+        level_counts[level] = level_counts.get(level, 0) + 1
+        for f in factors or []:
+            factor_counts[f] = factor_counts.get(f, 0) + 1
+
+    if tension_count == 0 and not logs:
+        await db.delete(stats)
+        return
+
+    stats.diary_tension_sum = tension_sum
+    stats.diary_tension_count = tension_count
+    stats.diary_tension_min = tension_min
+    stats.diary_tension_max = tension_max
+    stats.emotion_count = len(logs)
+    stats.emotion_tension_sum = sum(tension for tension, _, _ in logs)
+    stats.low_count = level_counts["low"]
+    stats.normal_count = level_counts["normal"]
+    stats.high_count = level_counts["high"]
+    stats.factor_counts = factor_counts
+
+
+async def rebuild_daily_stats(
+    db: AsyncSession, user_id: int | None = None, batch_size: int = 500
+) -> int:
+    """
+    ロールアップを生データから作り直す（バックフィル・ずれ修正用）。
+    再集計した日数を返す。
+
+    テーブルを空にしてから作り直すと、その間ダッシュボードが空や途中の集計を返すので、
+    (ユーザー, 日付) ごとに refresh_daily_stats で置き換える（元データがなくなった日の行は削除）。
+    どの時点でも各行は再集計前か後の値のどちらかになる。
+    """
+    diary_days = select(Diary.user_id, func.date(Diary.created_at).label("day"))
+    log_days = select(
+        Diary.user_id, func.date(EmotionLog.created_at).label("day")
+    ).join(EmotionLog, EmotionLog.diary_id == Diary.id)
+    # 元データが消えた日の行も再集計（= 削除）の対象にする
+    rollup_days = select(UserDailyStats.user_id, UserDailyStats.date)
+    if user_id is not None:
+        diary_days = diary_days.where(Diary.user_id == user_id)
+        log_days = log_days.where(Diary.user_id == user_id)
+        rollup_days = rollup_days.where(UserDailyStats.user_id == user_id)
+
+    days = (await db.execute(union(diary_days, log_days, rollup_days))).all()
+
+    for i, (day_user_id, day) in enumerate(days, start=1):
+        await refresh_daily_stats(db, day_user_id, _as_date(day))
+        if i % batch_size == 0:
+            await db.commit()
+    await db.commit()
+    return len(days)
+
+
+async def _main(user_id: int | None) -> None:
+    from app.db import AsyncSessionLocal, async_engine
+
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            count = await rebuild_daily_stats(db, user_id=user_id)
+    finally:
+        # プールの接続（aiosqlite はスレッド）を閉じないとプロセスが終了しない
+        await async_engine.dispose()
+    elapsed = time.perf_counter() - started
+    print(f"user_daily_stats を再構築しました: {count} 日分 ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="user_daily_stats を再構築する")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(_main(args.user_id))
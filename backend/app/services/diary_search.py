@@ -0,0 +1,151 @@
+"""
+日記本文・タイトルの全文検索
+
+日本語は空白で単語が区切られないため、文字 n-gram の転置インデックスを使う。
+- Postgres: pg_trgm の GIN インデックス（title || ' ' || content の式インデックス）
+- SQLite  : FTS5 の trigram トークナイザ（外部コンテンツテーブル + トリガで同期）
+
+どちらも3文字未満の語はインデックスで引けないため、その語だけは
+ユーザーの日記に対する LIKE で絞り込む（user_id のインデックスで範囲は限定される）。
+
+※ Postgres で日本語をトライグラム化するには、DBのロケールが C 以外
+  （例: ja_JP.UTF-8 / en_US.UTF-8）である必要がある。
+"""
+
+from sqlalchemy import (
+    DDL,
+    String,
+    column,
+    event,
+    func,
+    literal_column,
+    select,
+    table,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Diary
+
+# トライグラムインデックスで引ける最小の語長
+MIN_INDEXED_TERM_LENGTH = 3
+
+# SQLite の FTS5 仮想テーブル（rowid = diaries.id）
+_diaries_fts = table("diaries_fts", column("rowid"))
+
+# 検索対象の文字列。Postgres の式インデックスと一致させるため、
+# 空文字・空白はバインド変数ではなくリテラルとして埋め込む
+search_text = (
+    func.coalesce(Diary.title, literal_column("''", String))
+    + literal_column("' '", String)
+    + Diary.content
+)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_diaries_search_trgm ON diaries "
+    "USING gin ((coalesce(title, '') || ' ' || content) gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS diaries_fts USING fts5("
+    "title, content, content='diaries', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS diaries_fts_ai AFTER INSERT ON diaries BEGIN "
+    "INSERT INTO diaries_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS diaries_fts_ad AFTER DELETE ON diaries BEGIN "
+    "INSERT INTO diaries_fts(diaries_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS diaries_fts_au AFTER UPDATE ON diaries BEGIN "
+    "INSERT INTO diaries_fts(diaries_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO diaries_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+]
+
+# create_all でテーブルを作る場合（RUN_MIGRATIONS=true）にも検索インデックスを作る
+for _statement in POSTGRES_DDL:
+    event.listen(
+        Diary.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="postgresql"),
+    )
+for _statement in SQLITE_DDL:
+    event.listen(
+        Diary.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite")
+    )
+
+
+def split_terms(query: str) -> list[str]:
+    """検索語を空白（全角含む）で分割する"""
+    return [t for t in query.replace("　", " ").split() if t]
+
+
+def _escape_like(term: str) -> str:
+    # バックスラッシュは方言ごとに文字列リテラルの扱いが異なるため "!" で退避する
+    return term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _contains(term: str):
+    return search_text.like(f"%{_escape_like(term)}%", escape="!")
+
+
+def _fts5_phrase(term: str) -> str:
+    # FTS5 の構文文字をそのまま検索できるよう語をフレーズとして引用する
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _build_postgres_query(user_id: int, terms: list[str]):
+    # ILIKE '%語%' は pg_trgm の GIN インデックスで評価される
+    conditions = [search_text.ilike(f"%{_escape_like(t)}%", escape="!") for t in terms]
+    score = func.similarity(search_text, " ".join(terms))
+    return (
+        select(Diary)
+        .where(Diary.user_id == user_id, *conditions)
+        .order_by(score.desc(), Diary.created_at.desc(), Diary.id.desc())
+    )
+
+
+def _build_sqlite_query(user_id: int, terms: list[str]):
+    indexed = [t for t in terms if len(t) >= MIN_INDEXED_TERM_LENGTH]
+    short = [t for t in terms if len(t) < MIN_INDEXED_TERM_LENGTH]
+
+    stmt = select(Diary).where(Diary.user_id == user_id, *map(_contains, short))
+    if not indexed:
+        return stmt.order_by(Diary.created_at.desc(), Diary.id.desc())
+
+    match = " ".join(_fts5_phrase(t) for t in indexed)
+    return (
+        stmt.join(_diaries_fts, _diaries_fts.c.rowid == Diary.id)
+        .where(literal_column("diaries_fts").op("MATCH")(match))
+        .order_by(
+            func.bm25(literal_column("diaries_fts")),
+            Diary.created_at.desc(),
+            Diary.id.desc(),
+        )
+    )
+
+
+async def search_diaries(
+    db: AsyncSession, user_id: int, query: str, limit: int, offset: int = 0
+) -> list[Diary]:
+    """
+    ユーザーの日記を検索し、関連度順に limit 件返す。
+    次ページ判定のため limit + 1 件まで返すことがある。
+    """
+    terms = split_terms(query)
+    if not terms:
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        stmt = _build_postgres_query(user_id, terms)
+    elif db.bind.dialect.name == "sqlite":
+        stmt = _build_sqlite_query(user_id, terms)
+    else:
+        stmt = (
+            select(Diary)
+            .where(Diary.user_id == user_id, *map(_contains, terms))
+            .order_by(Diary.created_at.desc(), Diary.id.desc())
+        )
+
+    result = await db.scalars(stmt.offset(offset).limit(limit + 1))
+    return list(result.all())
@@ -0,0 +1,279 @@
+"""
+感情カテゴリごとに事前生成しておく花画像のプール
+
+日記の花画像は感情カテゴリ（flower_prompts.txt のセクション）ごとに同じプロンプトから
+生成されるので、カテゴリごとに FLOWER_POOL_SIZE 枚を先に作っておき、
+日記の作成時にはプールから1枚取り出して割り当てる（Imagen の待ち時間がなくなる）。
+
+- 取り出した行は削除する（同じ画像が2つの日記に割り当てられない）
+- 残りが FLOWER_POOL_LOW_WATERMARK 枚を下回ったら補充ジョブを登録する
+- 行にはプロンプトのハッシュを記録し、プロンプトが変わった画像は使わない
+  （補充時にストレージのオブジェクトごと削除する）
+
+全カテゴリを補充する（デプロイ前の事前生成など）:
+    python -m app.services.flower_pool [--emotion-key KEY]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models import FlowerImage, FlowerPoolImage, Job
+from app.services.job_queue import enqueue_job
+from app.services.ml import PromptBuilder
+from app.services.ml.image_generator import get_image_generator
+from prompts import load_flower_prompts
+
+logger = logging.getLogger(__name__)
+
+FLOWER_POOL_REFILL_JOB = "flower_pool_refill"
+
+
+def prompt_hash(prompt: str) -> str:
+    """プール画像の版（プロンプトの sha256 の先頭16桁）"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def emotion_keys() -> list[str]:
+    """プールを用意する感情カテゴリ（flower_prompts.txt のセクション名）"""
+    return list(load_flower_prompts())
+
+
+async def available_count(db: AsyncSession, emotion_key: str, version: str) -> int:
+    return await db.scalar(
+        select(func.count())
+        .select_from(FlowerPoolImage)
+        .where(
+            FlowerPoolImage.emotion_key == emotion_key,
+            FlowerPoolImage.prompt_version == version,
+        )
+    )
+
+
+async def claim_pooled_image(
+    db: AsyncSession, emotion_key: str, version: str
+) -> FlowerPoolImage | None:
+    """
+    プールから1枚取り出して行を削除する（なければ None）。
+    コミットは呼び出し側のトランザクションに任せる。
+    """
+    # 同時に取り出すトランザクション同士が同じ行を待たないよう SKIP LOCKED で選ぶ
+    # （SQLite では FOR UPDATE は無視され、書き込みはDB全体で直列になる）
+    candidate = (
+        select(FlowerPoolImage.id)
+        .where(
+            FlowerPoolImage.emotion_key == emotion_key,
+            FlowerPoolImage.prompt_version == version,
+        )
+        .order_by(FlowerPoolImage.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    return await db.scalar(
+        delete(FlowerPoolImage)
+        .where(FlowerPoolImage.id.in_(candidate))
+        .returning(FlowerPoolImage)
+    )
+
+
+async def request_refill(db: AsyncSession, emotion_key: str) -> Job | None:
+    """
+    補充ジョブを登録する（同じカテゴリの補充が待機中なら何もしない）。
+    実行中の補充は開始時点の残り枚数から生成数を決めているので、
+    その後に取り出された分は次の補充ジョブで埋める（補充は1件ずつ実行される）。
+    """
+    job = await db.scalar(
+        select(Job.id)
+        .where(
+            Job.kind == FLOWER_POOL_REFILL_JOB,
+            Job.status == "pending",
+            Job.payload["emotion_key"].as_string() == emotion_key,
+        )
+        .limit(1)
+    )
+    if job is not None:
+        return None
+    return enqueue_job(db, FLOWER_POOL_REFILL_JOB, {"emotion_key": emotion_key})
+
+
+async def assign_pooled_flower(
+    db: AsyncSession, diary_id: int, content: str, mood: str | None
+) -> FlowerImage | None:
+    """
+    日記の感情カテゴリの画像をプールから割り当て、flower_images に追加する。
+    プールが空なら None（呼び出し側で生成ジョブを登録する）。
+    残りが少なければ補充ジョブも登録するので、呼び出し側はコミット後に
+    job_worker.notify() を呼ぶ。
+    """
+    emotion_key = PromptBuilder().classify_emotion(diary_content=content, mood=mood)
+    prompt = PromptBuilder.prompt_for(emotion_key)
+    version = prompt_hash(prompt)
+
+    pooled = await claim_pooled_image(db, emotion_key, version)
+    if (
+        await available_count(db, emotion_key, version)
+        < settings.FLOWER_POOL_LOW_WATERMARK
+    ):
+        await request_refill(db, emotion_key)
+    if pooled is None:
+        logger.info(f"花画像プールが空です: {emotion_key}")
+        return None
+
+    flower_image = FlowerImage(
+        diary_id=diary_id, image_url=pooled.image_url, prompt=pooled.prompt
+    )
+    db.add(flower_image)
+    await db.flush()
+    return flower_image
+
+
+async def _delete_blobs(blob_names: list[str]) -> None:
+    store = get_image_generator().store
+    for blob_name in blob_names:
+        try:
+            await store.delete(blob_name)
+        except Exception as e:
+            # 行は削除済みなので、オブジェクトが残っても割り当てられることはない
+            logger.warning(f"プール画像の削除に失敗しました: {blob_name}: {str(e)}")
+
+
+async def refill_pool(emotion_key: str) -> int:
+    """
+    感情カテゴリのプールを FLOWER_POOL_SIZE 枚まで補充し、生成した枚数を返す。
+    プロンプトが変わる前の画像は先に削除する。
+    1枚ずつコミットするので、途中で失敗しても再実行で続きから補充される。
+    """
+    prompt = PromptBuilder.prompt_for(emotion_key)
+    version = prompt_hash(prompt)
+
+    async with AsyncSessionLocal() as db:
+        stale = (
+            await db.scalars(
+                delete(FlowerPoolImage)
+                .where(
+                    FlowerPoolImage.emotion_key == emotion_key,
+                    FlowerPoolImage.prompt_version != version,
+                )
+                .returning(FlowerPoolImage.blob_name)
+            )
+        ).all()
+        available = await available_count(db, emotion_key, version)
+        await db.commit()
+    if stale:
+        logger.info(f"古いプール画像を削除します: {emotion_key} {len(stale)} 件")
+        await _delete_blobs(list(stale))
+
+    generator = get_image_generator()
+    generated = 0
+    # 画像生成・アップロードの間はDB接続を保持しない
+    for _ in range(settings.FLOWER_POOL_SIZE - available):
+        blob_name = f"flowers/pool/{emotion_key}/{version}/{uuid.uuid4().hex}.png"
+        image_url = await generator.generate_image(prompt, blob_name)
+        async with AsyncSessionLocal() as db:
+            db.add(
+                FlowerPoolImage(
+                    emotion_key=emotion_key,
+                    prompt_version=version,
+                    prompt=prompt,
+                    blob_name=blob_name,
+                    image_url=image_url,
+                )
+            )
+            await db.commit()
+        generated += 1
+    return generated
+
+
+async def prune_unknown_keys(db: AsyncSession) -> int:
+    """flower_prompts.txt から消えた感情カテゴリの画像を削除する"""
+    removed = (
+        await db.scalars(
+            delete(FlowerPoolImage)
+            .where(FlowerPoolImage.emotion_key.not_in(emotion_keys()))
+            .returning(FlowerPoolImage.blob_name)
+        )
+    ).all()
+    await db.commit()
+    await _delete_blobs(list(removed))
+    return len(removed)
+
+
+async def request_refill_all(db: AsyncSession) -> int:
+    """全カテゴリの補充ジョブを登録する（コミットは呼び出し側）"""
+    jobs = [await request_refill(db, key) for key in emotion_keys()]
+    return sum(job is not None for job in jobs)
+
+
+async def pool_status(db: AsyncSession) -> dict:
+    """感情カテゴリごとの残り枚数（現在のプロンプトの版と、古い版）"""
+    rows = (
+        await db.execute(
+            select(
+                FlowerPoolImage.emotion_key,
+                FlowerPoolImage.prompt_version,
+                func.count(),
+            ).group_by(FlowerPoolImage.emotion_key, FlowerPoolImage.prompt_version)
+        )
+    ).all()
+    counts: dict[str, dict[str, int]] = {}
+    for emotion_key, version, count in rows:
+        counts.setdefault(emotion_key, {})[version] = count
+
+    categories = {}
+    for emotion_key in emotion_keys():
+        version = prompt_hash(PromptBuilder.prompt_for(emotion_key))
+        by_version = counts.pop(emotion_key, {})
+        available = by_version.pop(version, 0)
+        categories[emotion_key] = {
+            "version": version,
+            "available": available,
+            "stale": sum(by_version.values()),
+        }
+    return {
+        "enabled": settings.FLOWER_POOL_ENABLED,
+        "size": settings.FLOWER_POOL_SIZE,
+        "low_watermark": settings.FLOWER_POOL_LOW_WATERMARK,
+        "categories": categories,
+        # flower_prompts.txt から消えたカテゴリ
+        "unknown": {key: sum(v.values()) for key, v in counts.items()},
+    }
+
+
+async def _main(emotion_key: str | None) -> None:
+    from app.db import async_engine
+    from app.services.ml.image_generator import close_image_generator
+
+    started = time.perf_counter()
+    try:
+        if emotion_key is None:
+            async with AsyncSessionLocal() as db:
+                removed = await prune_unknown_keys(db)
+            if removed:
+                print(f"不要になったカテゴリの画像を削除しました: {removed} 件")
+        for key in [emotion_key] if emotion_key else emotion_keys():
+            generated = await refill_pool(key)
+            print(f"{key}: {generated} 枚を生成しました")
+    finally:
+        close_image_generator()
+        # プールの接続（aiosqlite はスレッド）を閉じないとプロセスが終了しない
+        await async_engine.dispose()
+    elapsed = time.perf_counter() - started
+    print(f"花画像プールを補充しました ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="感情カテゴリごとの花画像プールを補充する"
+    )
+    parser.add_argument("--emotion-key", default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.emotion_key))
@@ -0,0 +1,106 @@
+"""
+バックグラウンドジョブのハンドラ
+
+ハンドラは失敗すると再実行されるため、途中まで処理済みでも
+同じ結果になるよう（冪等に）書く。
+"""
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models import Diary, FlowerImage
+from app.services.chat_context import refresh_chat_summary
+from app.services.flower_pool import (
+    FLOWER_POOL_REFILL_JOB,
+    assign_pooled_flower,
+    refill_pool,
+)
+from app.services.job_queue import PermanentJobError, job_handler, job_worker
+from app.services.ml import AICommentService, PromptBuilder
+from app.services.ml.image_generator import get_image_generator
+
+AI_COMMENT_JOB = "ai_comment"
+CHAT_SUMMARY_JOB = "chat_summary"
+FLOWER_IMAGE_JOB = "flower_image"
+
+
+@job_handler(AI_COMMENT_JOB)
+async def generate_ai_comment(payload: dict) -> None:
+    """日記のAIコメントを生成して保存する（コメント済みの日記はスキップ）"""
+    diary_id = payload["diary_id"]
+    async with AsyncSessionLocal() as db:
+        diary = await db.get(Diary, diary_id)
+        if diary is None or diary.ai_comment:
+            return
+        content, photo_url, mood = diary.content, diary.photo_url, diary.mood
+
+    # OpenAI の応答待ちの間はDB接続を保持しない
+    comment_service = AICommentService()
+    comment = await comment_service.generate_comment(
+        diary_content=content,
+        photo_url=photo_url,
+        mood=mood,
+    )
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Diary)
+            .where(Diary.id == diary_id, Diary.ai_comment.is_(None))
+            .values(ai_comment=comment)
+        )
+        await db.commit()
+
+
+@job_handler(CHAT_SUMMARY_JOB)
+async def summarize_chat(payload: dict) -> None:
+    """文脈に収まらなくなった古い会話をユーザーの要約に畳み込む"""
+    async with AsyncSessionLocal() as db:
+        while await refresh_chat_summary(db, payload["user_id"]):
+            pass
+
+
+@job_handler(FLOWER_IMAGE_JOB, concurrency=settings.FLOWER_JOB_CONCURRENCY)
+async def generate_flower_image(payload: dict) -> dict:
+    """日記から花の画像を生成して flower_images に保存する"""
+    diary_id = payload["diary_id"]
+    async with AsyncSessionLocal() as db:
+        diary = await db.get(Diary, diary_id)
+        if diary is None:
+            # 再実行しても結果は変わらないので即 failed にする
+            raise PermanentJobError("日記が見つかりません")
+        content, mood = diary.content, diary.mood
+
+        # プールに同じ感情カテゴリの画像があればそれを割り当てる
+        if settings.FLOWER_POOL_ENABLED:
+            flower_image = await assign_pooled_flower(db, diary_id, content, mood)
+            await db.commit()
+            job_worker.notify()
+            if flower_image is not None:
+                return {
+                    "flower_image_id": flower_image.id,
+                    "image_url": flower_image.image_url,
+                }
+
+    prompt = PromptBuilder().analyze_emotion_and_build_prompt(
+        diary_content=content, mood=mood
+    )
+    # 画像生成・アップロードの間はDB接続を保持しない
+    image_url = await get_image_generator().generate_flower_image(
+        prompt=prompt, diary_id=diary_id
+    )
+
+    async with AsyncSessionLocal() as db:
+        flower_image = FlowerImage(
+            diary_id=diary_id, image_url=image_url, prompt=prompt
+        )
+        db.add(flower_image)
+        await db.commit()
+        return {"flower_image_id": flower_image.id, "image_url": image_url}
+
+
+@job_handler(FLOWER_POOL_REFILL_JOB, concurrency=1)
+async def refill_flower_pool(payload: dict) -> dict:
+    """感情カテゴリの花画像プールを FLOWER_POOL_SIZE 枚まで補充する"""
+    generated = await refill_pool(payload["emotion_key"])
+    return {"generated": generated}
@@ -0,0 +1,485 @@
+"""
+DBをバックエンドにしたバックグラウンドジョブキュー
+
+asyncio.create_task で投げっぱなしにすると、同時実行数の上限もリトライもなく、
+デプロイやワーカー再起動のたびに処理中のタスクが失われる。
+ジョブを jobs テーブルに記録し、ワーカーが取り出して実行する。
+
+- 登録: enqueue_job(db, kind, payload) を業務データと同じトランザクションで呼ぶ
+        （コミットされた日記には必ずジョブが残る）
+- 実行: @job_handler(kind) で登録したハンドラを、最大 JOB_CONCURRENCY 件並列で実行
+        （concurrency を指定した種別は、その件数までしか同時に実行しない）
+- 結果: ハンドラが返した dict は jobs.result に保存され、状態とあわせて参照できる
+- 失敗: 指数バックオフで JOB_MAX_ATTEMPTS 回まで再実行し、超えたら failed にする
+        （PermanentJobError は再実行せずに failed にする）
+- 停止: 実行中のジョブは猶予時間だけ待ち、終わらなければキューに戻す。
+        実行中は JOB_HEARTBEAT_INTERVAL ごとに locked_at を更新するので、
+        更新が JOB_LOCK_TIMEOUT 以上途絶えた（プロセスが落ちた）ジョブだけを別のワーカーが再取得する
+- 掃除: done / failed になってから JOB_RETENTION_DAYS 日を過ぎたジョブは、
+        ワーカーが JOB_RETENTION_SWEEP_INTERVAL ごとに削除する
+
+ワーカーは APIプロセス内（JOB_WORKER_ENABLED=true）で動くほか、
+別プロセスとしても起動できる:
+    python -m app.services.job_queue [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import signal
+import time
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal, async_engine
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[dict | None]]
+
+
+class PermanentJobError(Exception):
+    """再実行しても結果が変わらない失敗（対象の行がない等）。リトライせずに failed にする"""
+
+
+_handlers: dict[str, JobHandler] = {}
+# 種別ごとの同時実行数の上限（画像生成など重いジョブが枠を占有しないように）
+_kind_limits: dict[str, int] = {}
+
+
+def job_handler(kind: str, concurrency: int | None = None):
+    """ジョブ種別に対するハンドラを登録するデコレータ"""
+
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        if concurrency is not None:
+            _kind_limits[kind] = concurrency
+        return func
+
+    return register
+
+
+def enqueue_job(
+    db: AsyncSession, kind: str, payload: dict, max_attempts: int | None = None
+) -> Job:
+    """
+    ジョブを登録する。コミットは呼び出し側のトランザクションに任せる。
+    """
+    job = Job(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts 回目の失敗後、次の実行までの待ち時間（秒）"""
+    delay = min(
+        settings.JOB_RETRY_MAX_DELAY,
+        settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    )
+    # 同時に失敗したジョブが同じ時刻に再実行されないよう揺らぎを加える
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobMetrics:
+    """ジョブの処理件数・待ち時間・実行時間を記録する"""
+
+    def __init__(self):
+        self.started = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.released = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    def record_start(self, wait_seconds: float):
+        self.started += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def record_run(self, run_seconds: float):
+        self.run_seconds_total += run_seconds
+        self.run_seconds_max = max(self.run_seconds_max, run_seconds)
+
+    def record_success(self, latency_seconds: float):
+        self.succeeded += 1
+        self.latency_seconds_total += latency_seconds
+        self.latency_seconds_max = max(self.latency_seconds_max, latency_seconds)
+
+    async def snapshot(self, db: AsyncSession) -> dict:
+        now = datetime.utcnow()
+        depth = dict(
+            (await db.execute(select(Job.status, func.count()).group_by(Job.status)))
+            .tuples()
+            .all()
+        )
+        oldest_ready = await db.scalar(
+            select(func.min(Job.run_at)).where(
+                Job.status == "pending", Job.run_at <= now
+            )
+        )
+        finished = self.succeeded + self.retried + self.failed
+        return {
+            "depth": {
+                status: depth.get(status, 0)
+                for status in ("pending", "running", "done", "failed")
+            },
+            # 実行可能になってから最も長く待っているジョブの待ち時間
+            "oldest_ready_seconds": (
+                (now - oldest_ready).total_seconds() if oldest_ready else 0.0
+            ),
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "released": self.released,
+            # 実行予定時刻から取り出されるまで
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.started if self.started else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+            # ハンドラの実行時間
+            "run_seconds_avg": (self.run_seconds_total / finished if finished else 0.0),
+            "run_seconds_max": self.run_seconds_max,
+            # 登録から成功まで（リトライ待ちを含む）
+            "latency_seconds_avg": (
+                self.latency_seconds_total / self.succeeded if self.succeeded else 0.0
+            ),
+            "latency_seconds_max": self.latency_seconds_max,
+        }
+
+
+job_metrics = JobMetrics()
+
+
+async def claim_jobs(
+    db: AsyncSession,
+    limit: int,
+    kinds: list[str] | None = None,
+    exclude_kinds: list[str] | None = None,
+) -> list[Job]:
+    """
+    実行可能なジョブを最大 limit 件取り出し、running にして返す。
+
+    Postgres では FOR UPDATE SKIP LOCKED で複数ワーカーが同じ行を取り合わない。
+    SQLite では UPDATE 全体が1つの書き込みロック内で評価される。
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        and_(Job.status == "pending", Job.run_at <= now),
+        # ワーカーが落ちて running のまま残ったジョブ（ハートビートが途絶えたもの）
+        and_(
+            Job.status == "running",
+            Job.locked_at < now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+        ),
+    )
+    candidates = (
+        select(Job.id)
+        .where(claimable)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if kinds:
+        candidates = candidates.where(Job.kind.in_(kinds))
+    if exclude_kinds:
+        candidates = candidates.where(Job.kind.not_in(exclude_kinds))
+
+    jobs = await db.scalars(
+        update(Job)
+        .where(Job.id.in_(candidates), claimable)
+        .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+        .returning(Job)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = list(jobs.all())
+    await db.commit()
+    return claimed
+
+
+async def _finish(job: Job, **values) -> None:
+    """
+    ジョブの結果を書き込む。
+    ロック期限切れで別のワーカーに再取得されていた場合は何もしない。
+    """
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job)
+            .where(
+                Job.id == job.id,
+                Job.status == "running",
+                Job.locked_at == job.locked_at,
+            )
+            .values(**values)
+        )
+        await db.commit()
+
+
+async def purge_finished_jobs(
+    db: AsyncSession, older_than: timedelta, batch_size: int = 1000
+) -> int:
+    """
+    終了（done / failed）から older_than を過ぎたジョブを削除し、削除件数を返す。
+    ロックを長く持たないよう batch_size 件ずつコミットする。
+    """
+    cutoff = datetime.utcnow() - older_than
+    total = 0
+    while True:
+        batch = (
+            select(Job.id)
+            .where(Job.status.in_(["done", "failed"]), Job.finished_at < cutoff)
+            .limit(batch_size)
+        )
+        result = await db.execute(
+            delete(Job)
+            .where(Job.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+class JobWorker:
+    """jobs テーブルをポーリングしてハンドラを並列実行するワーカー"""
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        poll_interval: float | None = None,
+        kinds: list[str] | None = None,
+    ):
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.kinds = kinds
+        self._tasks: set[asyncio.Task] = set()
+        # 種別ごとの実行中の件数
+        self._running: Counter[str] = Counter()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._loop_task: asyncio.Task | None = None
+        self._swept_at: float | None = None
+
+    def notify(self) -> None:
+        """新しいジョブの登録や空き枠の発生を知らせ、ポーリング待ちを打ち切る"""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.notify()
+        if self._loop_task is not None:
+            await self._loop_task
+            self._loop_task = None
+        if not self._tasks:
+            return
+        # 実行中のジョブは猶予時間だけ待ち、終わらなければキャンセルしてキューに戻す
+        _, pending = await asyncio.wait(
+            self._tasks, timeout=settings.JOB_SHUTDOWN_GRACE
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self) -> None:
+        logger.info(f"JobWorker started (concurrency={self.concurrency})")
+        while not self._stopping:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._tasks)
+            if free > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        jobs = await self._claim(db, free)
+                except Exception as e:
+                    logger.error(f"ジョブの取得に失敗しました: {str(e)}")
+                    jobs = []
+                for job in jobs:
+                    task = asyncio.create_task(self._execute(job))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._on_done)
+            await self._sweep()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sweep(self) -> None:
+        """JOB_RETENTION_SWEEP_INTERVAL ごとに古い終了済みジョブを削除する"""
+        now = time.monotonic()
+        if (
+            self._swept_at is not None
+            and now - self._swept_at < settings.JOB_RETENTION_SWEEP_INTERVAL
+        ):
+            return
+        self._swept_at = now
+        try:
+            async with AsyncSessionLocal() as db:
+                count = await purge_finished_jobs(
+                    db, timedelta(days=settings.JOB_RETENTION_DAYS)
+                )
+        except Exception as e:
+            logger.error(f"終了済みジョブの削除に失敗しました: {str(e)}")
+            return
+        if count:
+            logger.info(f"終了済みのジョブを削除しました: {count} 件")
+
+    async def _claim(self, db: AsyncSession, free: int) -> list[Job]:
+        """上限のある種別はその空き枠の分だけ、残りの枠はそれ以外の種別から取り出す"""
+        jobs = []
+        for kind, limit in _kind_limits.items():
+            if self.kinds and kind not in self.kinds:
+                continue
+            n = min(free - len(jobs), limit - self._running[kind])
+            if n > 0:
+                jobs += await claim_jobs(db, n, [kind])
+        if free > len(jobs):
+            jobs += await claim_jobs(
+                db, free - len(jobs), self.kinds, exclude_kinds=list(_kind_limits)
+            )
+        return jobs
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self.notify()
+
+    async def _execute(self, job: Job) -> None:
+        self._running[job.kind] += 1
+        try:
+            await self._run_handler(job)
+        finally:
+            self._running[job.kind] -= 1
+
+    async def _heartbeat(self, job: Job, stop: asyncio.Event) -> None:
+        """実行中のジョブの locked_at を定期的に更新し、再取得されないようにする"""
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), settings.JOB_HEARTBEAT_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            now = datetime.utcnow()
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        update(Job)
+                        .where(
+                            Job.id == job.id,
+                            Job.status == "running",
+                            Job.locked_at == job.locked_at,
+                        )
+                        .values(locked_at=now)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"ジョブ {job.id} のロック更新に失敗しました: {str(e)}")
+                continue
+            if result.rowcount == 0:
+                # 別のワーカーに再取得された（このワーカーの結果は _finish で捨てられる）
+                logger.warning(f"ジョブ {job.id} ({job.kind}) のロックを失いました")
+                return
+            # _finish はこの値で自分のロックかを確かめる
+            job.locked_at = now
+
+    async def _call_handler(self, job: Job, handler: JobHandler) -> dict | None:
+        """ハートビートを送りながらハンドラを実行する"""
+        stop = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, stop))
+        try:
+            return await handler(job.payload)
+        finally:
+            # キャンセルせずに止め、更新中の locked_at を job に反映させてから結果を書く
+            stop.set()
+            await heartbeat
+
+    async def _run_handler(self, job: Job) -> None:
+        job_metrics.record_start((job.locked_at - job.run_at).total_seconds())
+        started = time.perf_counter()
+        try:
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                raise PermanentJobError(f"未登録のジョブ種別です: {job.kind}")
+            result = await self._call_handler(job, handler)
+        except asyncio.CancelledError:
+            # 停止時に中断したジョブは試行回数に数えずキューに戻す
+            job_metrics.released += 1
+            await _finish(job, status="pending", attempts=job.attempts - 1)
+            raise
+        except Exception as e:
+            job_metrics.record_run(time.perf_counter() - started)
+            now = datetime.utcnow()
+            if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+                job_metrics.failed += 1
+                logger.error(
+                    f"ジョブ {job.id} ({job.kind}) が失敗しました: {str(e)}",
+                    exc_info=True,
+                )
+                await _finish(job, status="failed", last_error=str(e), finished_at=now)
+            else:
+                job_metrics.retried += 1
+                delay = retry_delay(job.attempts)
+                logger.warning(
+                    f"ジョブ {job.id} ({job.kind}) を {delay:.1f} 秒後に再実行します: {str(e)}"
+                )
+                await _finish(
+                    job,
+                    status="pending",
+                    last_error=str(e),
+                    run_at=now + timedelta(seconds=delay),
+                )
+        else:
+            job_metrics.record_run(time.perf_counter() - started)
+            now = datetime.utcnow()
+            job_metrics.record_success((now - job.created_at).total_seconds())
+            await _finish(
+                job, status="done", last_error=None, result=result, finished_at=now
+            )
+
+
+# APIプロセス内で動かすワーカー（main.py のライフスパンで起動・停止する）
+job_worker = JobWorker()
+
+
+async def _main(concurrency: int | None) -> None:
+    # ハンドラを登録する
+    import app.services.job_handlers  # noqa: F401
+    from app.services.ml.openai_client import close_openai_client
+
+    worker = JobWorker(concurrency=concurrency)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.start()
+    await stop.wait()
+    await worker.stop()
+    await close_openai_client()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="バックグラウンドジョブのワーカー")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.concurrency))
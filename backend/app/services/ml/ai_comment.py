@@ -8,6 +8,9 @@
 
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.ml.llm_limiter import Priority, estimate_tokens, llm_limiter
+from app.services.ml.openai_client import get_openai_client
+from app.services.ml.response_cache import cache_key, response_cache
 
 SYSTEM_PROMPT = (
     "あなたは共感力の高い日記カウンセラーAIです。"
@@ -19,14 +22,21 @@ SYSTEM_PROMPT = (
 
 
 class AICommentService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        priority: Priority = Priority.BACKGROUND,
+    ):
+        # 再試行は 429 の待ちと合わせてリミッタが行う
+        self.client = (client or get_openai_client()).with_options(max_retries=0)
+        self.priority = priority
 
     async def generate_comment(
         self,
         diary_content: str,
         photo_url: str | None = None,
         mood: str | None = None,
+        bypass_cache: bool = False,
     ) -> str:
         """
         日記に対するAIコメントを生成する。
@@ -35,6 +45,7 @@ class AICommentService:
             diary_content: 日記本文
             photo_url: 添付写真の公開URL（オプション）
             mood: ムード文字列（例: "happy", "sad"）
+            bypass_cache: True なら応答キャッシュを使わずに生成し直す
 
         Returns:
             AIのコメント文字列
@@ -66,10 +77,22 @@ class AICommentService:
             ]
             model = settings.OPENAI_MODEL
 
-        response = await self.client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.8,
-            max_tokens=400,
+        async def generate() -> str:
+            response = await llm_limiter.call(
+                model,
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.8,
+                    max_tokens=400,
+                    timeout=settings.OPENAI_TIMEOUT,
+                ),
+                estimated_tokens=estimate_tokens(messages, 400),
+                priority=self.priority,
+            )
+            return response.choices[0].message.content.strip()
+
+        # 同じ内容（モデル・プロンプト・本文・写真）なら保存済みのコメントを返す
+        return await response_cache.get_or_generate(
+            cache_key(model, messages, 400), model, generate, bypass=bypass_cache
         )
-        return response.choices[0].message.content.strip()
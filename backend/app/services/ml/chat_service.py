@@ -1,15 +1,20 @@
 from openai import AsyncOpenAI
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 from app.core.config import settings
+from app.services.ml.llm_limiter import Priority, estimate_tokens, llm_limiter
+from app.services.ml.openai_client import get_openai_client
 from prompts import load_prompt
 import logging
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_REPLY = "ごめんなさい、今うまくお話ができない状態みたいです。少し待ってからもう一度お話ししてもらえますか？"
+
 
 class ChatService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(self, client: AsyncOpenAI | None = None):
+        # 再試行は 429 の待ちと合わせてリミッタが行う
+        self.client = (client or get_openai_client()).with_options(max_retries=0)
         self.model = settings.OPENAI_MODEL
         self.system_prompt = load_prompt("system_prompts.txt")
 
@@ -17,31 +22,120 @@ class ChatService:
         logger.info(f"ChatService initialized with model: {self.model}")
         logger.info(f"API Key configured: {'Yes' if settings.OPENAI_API_KEY else 'No'}")
 
-    async def chat(
-        self, user_message: str, conversation_history: List[Dict[str, str]] = None
-    ) -> str:
+    def _build_messages(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        summary: str | None = None,
+    ) -> List[Dict[str, str]]:
         messages = [{"role": "system", "content": self.system_prompt}]
 
-        # 会話履歴を追加
+        # 古い会話の要約を追加
+        if summary:
+            messages.append(
+                {"role": "system", "content": f"これまでの会話の要約:\n{summary}"}
+            )
+
+        # 会話履歴を追加（トークン予算内に収めたものが渡される）
         if conversation_history:
-            messages.extend(conversation_history[-20:])  # 最新20件
+            messages.extend(conversation_history)
 
         # 現在のメッセージを追加
         messages.append({"role": "user", "content": user_message})
+        return messages
+
+    async def chat(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        summary: str | None = None,
+    ) -> str:
+        messages = self._build_messages(user_message, conversation_history, summary)
 
         # デバッグ: 送信するメッセージを確認
         logger.info(f"Sending {len(messages)} messages to OpenAI API")
         logger.debug(f"Messages: {messages}")
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500,
+            response = await llm_limiter.call(
+                self.model,
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500,
+                    timeout=settings.OPENAI_CHAT_TIMEOUT,
+                ),
+                estimated_tokens=estimate_tokens(messages, 500),
+                priority=Priority.INTERACTIVE,
             )
             logger.info(f"OpenAI API response received successfully")
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"OpenAI API エラー: {str(e)}", exc_info=True)
-            return "ごめんなさい、今うまくお話ができない状態みたいです。少し待ってからもう一度お話ししてもらえますか？"
+            return FALLBACK_REPLY
+
+    async def stream_chat(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        summary: str | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        返答を生成されたそばから断片ごとに返す。
+        呼び出し側がイテレーションを中断（キャンセル・aclose）すると
+        上流のHTTPレスポンスも閉じられ、OpenAI側の生成も打ち切られる。
+        """
+        messages = self._build_messages(user_message, conversation_history, summary)
+        logger.info(f"Streaming {len(messages)} messages to OpenAI API")
+
+        # ストリーミング中は実行枠を保持し続ける
+        async with llm_limiter.limit(
+            self.model, estimate_tokens(messages, 500), Priority.INTERACTIVE
+        ):
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+                timeout=settings.OPENAI_CHAT_TIMEOUT,
+                stream=True,
+            )
+            async with stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+
+    async def summarize(
+        self, previous_summary: str | None, conversation: List[Dict[str, str]]
+    ) -> str:
+        """これまでの要約に新しい会話を畳み込んだ要約を返す（バックグラウンド用）"""
+        lines = [
+            f"{'ユーザー' if m['role'] == 'user' else 'サポーター'}: {m['content']}"
+            for m in conversation
+        ]
+        user_content = (
+            f"これまでの要約:\n{previous_summary or '（なし）'}\n\n"
+            "新しい会話:\n" + "\n".join(lines)
+        )
+        messages = [
+            {"role": "system", "content": load_prompt("chat_summary_prompt.txt")},
+            {"role": "user", "content": user_content},
+        ]
+        max_tokens = settings.CHAT_SUMMARY_MAX_TOKENS
+        response = await llm_limiter.call(
+            self.model,
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=max_tokens,
+                timeout=settings.OPENAI_TIMEOUT,
+            ),
+            estimated_tokens=estimate_tokens(messages, max_tokens),
+            priority=Priority.BACKGROUND,
+        )
+        return response.choices[0].message.content.strip()
@@ -1,5 +1,9 @@
 from openai import AsyncOpenAI
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.services.ml.llm_limiter import Priority, estimate_tokens, llm_limiter
+from app.services.ml.openai_client import get_openai_client
+from app.services.ml.response_cache import cache_key, response_cache
 
 # 感情要因カテゴリ定義（キー・ラベルのマスタ）
 EMOTION_FACTORS = {
@@ -26,9 +30,15 @@ def classify_tension_level(tension: int) -> str:
 
 
 class EmotionAnalysisService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ):
+        # 再試行は 429 の待ちと合わせてリミッタが行う
+        self.client = (client or get_openai_client()).with_options(max_retries=0)
         self.model = settings.OPENAI_MODEL
+        self.priority = priority
 
     async def analyze(
         self,
@@ -36,10 +46,15 @@ class EmotionAnalysisService:
         tension_level: str,
         factors: list[str],
         diary_content: str,
+        bypass_cache: bool = False,
+        db: AsyncSession | None = None,
     ) -> str | None:
         """
         low / high のみAI分析を行い、テキストを返す。
         normal はNoneを返す（データ蓄積のみ）。
+        同じ入力（テンション・要因・本文）の再送信には保存済みの分析を返す
+        （bypass_cache=True なら生成し直す）。
+        リクエスト内で呼ぶ場合は、キャッシュの読み書きに使う db を渡す。
         """
         if tension_level == "normal":
             return None
@@ -75,13 +90,30 @@ class EmotionAnalysisService:
                 "このポジティブなエネルギーの源を分析してください。"
             )
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user_msg},
-            ],
-            temperature=0.7,
-            max_tokens=300,
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_msg},
+        ]
+
+        async def generate() -> str:
+            response = await llm_limiter.call(
+                self.model,
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=300,
+                    timeout=settings.OPENAI_TIMEOUT,
+                ),
+                estimated_tokens=estimate_tokens(messages, 300),
+                priority=self.priority,
+            )
+            return response.choices[0].message.content.strip()
+
+        return await response_cache.get_or_generate(
+            cache_key(self.model, messages, 300),
+            self.model,
+            generate,
+            bypass=bypass_cache,
+            db=db,
         )
-        return response.choices[0].message.content.strip()
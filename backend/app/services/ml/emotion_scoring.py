@@ -0,0 +1,250 @@
+"""
+日記コーパスの感情キーワードスコアを一括で計算する（管理画面の分析・研究用エクスポート向け）
+
+PromptBuilder と同じキーワード辞書・同じ数え方で数えたヒット数を
+(日記数 × 感情) の NumPy 行列として返す。列の並びは EMOTIONS。
+
+- 1件ずつ数えずに、チャンク全体を NumPy でまとめて数える（BatchKeywordCounter）
+- 入力はテキストのイテラブル。chunk_size 件ずつ処理するので、件数が多くてもメモリは一定
+- processes > 1 でチャンクをプロセスプールに分散する（結果は入力順のまま）
+
+全日記の分布を集計する（--output で日記ごとのスコアをCSVに書き出す）:
+    python -m app.services.ml.emotion_scoring [--user-id N]
+        [--chunk-size N] [--processes N] [--output PATH]
+"""
+
+import argparse
+import csv
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from app.services.ml.prompt_builder import EMOTION_KEYWORDS, EMOTIONS
+
+logger = logging.getLogger(__name__)
+
+
+# チャンクのテキストをつなぐ区切り
+_SEPARATOR = "\n"
+
+
+class BatchKeywordCounter:
+    """
+    テキストのリストのキーワードのヒット数を NumPy でまとめて数える。
+    KeywordMatcher と同じ数え方（キーワードごとの re.findall と同じ）になる。
+
+    チャンクをつないだ1本のコードポイント配列で、キーワードの先頭文字の位置を一度に拾い、
+    キーワードごとに候補位置だけを後続の文字と突き合わせる（1件ずつの Python ループを回さない）。
+    ヒット位置から (件数 × キーワード) の件数行列を作り、キーワード → グループの行列との積でまとめる。
+    """
+
+    def __init__(self, groups: dict[str, list[str]]):
+        self.groups: tuple[str, ...] = tuple(groups)
+        self._codes: list[np.ndarray] = []
+        # 自分自身と重なりうる（接頭辞と接尾辞が一致する）キーワード。重なったヒットを間引く
+        self._self_overlapping: list[bool] = []
+        # 先頭文字 -> キーワード番号
+        self._by_first: dict[int, list[int]] = {}
+        group_indices = []
+        for group_index, keywords in enumerate(groups.values()):
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                if _SEPARATOR in keyword:
+                    raise ValueError(f"キーワードに改行は使えません: {keyword!r}")
+                self._by_first.setdefault(ord(keyword[0]), []).append(len(self._codes))
+                self._codes.append(
+                    np.array([ord(ch) for ch in keyword], dtype=np.uint32)
+                )
+                self._self_overlapping.append(
+                    any(keyword[:i] == keyword[-i:] for i in range(1, len(keyword)))
+                )
+                group_indices.append(group_index)
+        self._first_chars = np.array(sorted(self._by_first), dtype=np.uint32)
+        # キーワード → グループの 0/1 行列（キーワード数 × グループ数）
+        self._keyword_groups = np.zeros(
+            (len(self._codes), len(self.groups)), dtype=np.int64
+        )
+        self._keyword_groups[np.arange(len(self._codes)), group_indices] = 1
+
+    def _positions(
+        self, chars: np.ndarray, candidates: np.ndarray, index: int
+    ) -> np.ndarray:
+        """先頭文字が一致する位置 candidates のうち、キーワード index がヒットする位置"""
+        code = self._codes[index]
+        positions = candidates[candidates + len(code) <= len(chars)]
+        for offset in range(1, len(code)):
+            if not len(positions):
+                break
+            positions = positions[chars[positions + offset] == code[offset]]
+        if self._self_overlapping[index] and len(positions) > 1:
+            kept = []
+            last_end = 0
+            for position in positions.tolist():
+                if position >= last_end:
+                    kept.append(position)
+                    last_end = position + len(code)
+            positions = np.array(kept)
+        return positions
+
+    def count(self, texts: list[str]) -> np.ndarray:
+        """(件数 × グループ) のヒット数行列（列は groups の順）"""
+        # 区切りを含むキーワードはないので、ヒットがテキストをまたぐことはない
+        joined = _SEPARATOR.join(texts)
+        chars = np.frombuffer(
+            joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        )
+        # 各テキストの開始位置（ヒット位置から行番号を引く）
+        starts = np.cumsum([0, *(len(text) + 1 for text in texts[:-1])])
+
+        candidates = np.flatnonzero(np.isin(chars, self._first_chars))
+        # 先頭文字ごとの候補位置を二分探索で切り出せるよう、文字で並べる（同じ文字の中は位置順）
+        order = np.argsort(chars[candidates], kind="stable")
+        candidates = candidates[order]
+        candidate_chars = chars[candidates]
+
+        n_keywords = len(self._codes)
+        cells = []
+        for first, indices in self._by_first.items():
+            lo, hi = np.searchsorted(candidate_chars, [first, first + 1])
+            if lo == hi:
+                continue
+            for index in indices:
+                positions = self._positions(chars, candidates[lo:hi], index)
+                if len(positions):
+                    rows = np.searchsorted(starts, positions, side="right") - 1
+                    cells.append(rows * n_keywords + index)
+        keyword_counts = np.bincount(
+            np.concatenate(cells) if cells else np.zeros(0, dtype=np.int64),
+            minlength=len(texts) * n_keywords,
+        ).reshape(len(texts), n_keywords)
+        return keyword_counts @ self._keyword_groups
+
+
+EMOTION_COUNTER = BatchKeywordCounter(EMOTION_KEYWORDS)
+
+
+def score_chunk(texts: list[str]) -> np.ndarray:
+    """テキストのリストを (件数 × 感情) のヒット数行列にする"""
+    return EMOTION_COUNTER.count([text.lower() for text in texts]).astype(np.int32)
+
+
+def _chunks(texts: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
+    iterator = iter(texts)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def iter_score_chunks(
+    texts: Iterable[str], chunk_size: int = 1000, processes: int = 1
+) -> Iterator[np.ndarray]:
+    """chunk_size 件ずつのヒット数行列を入力順に返す"""
+    if processes <= 1:
+        for chunk in _chunks(texts, chunk_size):
+            yield score_chunk(chunk)
+        return
+
+    # 入力を先読みしすぎないよう、投入済みのチャンクはプロセス数の2倍までにする
+    with ProcessPoolExecutor(processes) as pool:
+        pending = deque()
+        for chunk in _chunks(texts, chunk_size):
+            pending.append(pool.submit(score_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def score_texts(
+    texts: Iterable[str], chunk_size: int = 1000, processes: int = 1
+) -> np.ndarray:
+    """全テキストの (件数 × 感情) のヒット数行列を返す"""
+    started = time.perf_counter()
+    blocks = list(iter_score_chunks(texts, chunk_size, processes))
+    counts = (
+        np.vstack(blocks) if blocks else np.zeros((0, len(EMOTIONS)), dtype=np.int32)
+    )
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"感情スコア: {len(counts)} 件 "
+        f"({len(counts) / elapsed if elapsed else 0.0:.0f} 件/秒)"
+    )
+    return counts
+
+
+def _main(args) -> None:
+    from sqlalchemy import select
+
+    from app.db import engine
+    from app.models import Diary
+
+    stmt = select(Diary.id, Diary.content).order_by(Diary.id)
+    if args.user_id is not None:
+        stmt = stmt.where(Diary.user_id == args.user_id)
+
+    # 先読みされたテキストの日記IDを、行列が返ってくる順に取り出す
+    ids: deque[int] = deque()
+
+    def texts(rows) -> Iterator[str]:
+        for row in rows:
+            ids.append(row.id)
+            yield row.content
+
+    totals = np.zeros(len(EMOTIONS), dtype=np.int64)
+    # 最もヒットの多い感情ごとの日記数（同数なら EMOTIONS の先の方。PromptBuilder と同じ）
+    dominant = np.zeros(len(EMOTIONS), dtype=np.int64)
+    scored = 0
+    started = time.perf_counter()
+    output = (
+        open(args.output, "w", newline="", encoding="utf-8") if args.output else None
+    )
+    try:
+        writer = csv.writer(output) if output else None
+        if writer:
+            writer.writerow(["diary_id", *EMOTIONS])
+        with engine.connect() as conn:
+            rows = conn.execution_options(yield_per=args.chunk_size).execute(stmt)
+            for block in iter_score_chunks(
+                texts(rows), args.chunk_size, args.processes
+            ):
+                block_ids = [ids.popleft() for _ in range(len(block))]
+                totals += block.sum(axis=0)
+                matched = block.any(axis=1)
+                dominant += np.bincount(
+                    block[matched].argmax(axis=1), minlength=len(EMOTIONS)
+                )
+                if writer:
+                    writer.writerows(
+                        [diary_id, *row] for diary_id, row in zip(block_ids, block)
+                    )
+                scored += len(block)
+                elapsed = time.perf_counter() - started
+                print(f"{scored} 件 ({scored / elapsed if elapsed else 0.0:.0f} 件/秒)")
+    finally:
+        if output:
+            output.close()
+        engine.dispose()
+
+    print(f"{'感情':<12}{'ヒット数':>10}{'最多の日記数':>12}")
+    for emotion, total, count in zip(EMOTIONS, totals, dominant):
+        print(f"{emotion:<12}{total:>10}{count:>12}")
+    print(f"マッチなし: {scored - int(dominant.sum())} 件")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="全日記の感情キーワードスコアを集計する"
+    )
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--processes", type=int, default=1, help="2以上でプロセスプールに分散する"
+    )
+    parser.add_argument("--output", default=None, help="日記ごとのスコアを書き出すCSV")
+    logging.basicConfig(level=logging.INFO)
+    _main(parser.parse_args())
@@ -0,0 +1,248 @@
+"""
+OpenAI / Vertex AI Imagen のローカル代替（オフラインでの負荷試験・ベンチマーク用）
+
+LLM_PROVIDER=fake / IMAGE_PROVIDER=fake で本物のクライアントの代わりに使われる。
+ネットワークにも課金にも触れずに、API全体のスループットを測れるようにする。
+
+- 応答内容は入力から決まる（同じ入力には同じ応答）
+- 待ち時間は FAKE_LATENCY_DISTRIBUTION（fixed / uniform / lognormal）に従う
+- FAKE_ERROR_RATE の割合で 429 / 500 を返し、リミッタの再試行も通るようにする
+- stream=True では FAKE_STREAM_CHUNK_DELAY 秒ごとに断片を返す
+- 乱数は FAKE_SEED で固定する
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import struct
+import time
+import zlib
+
+import httpx
+from openai import InternalServerError, RateLimitError
+from openai.types import CompletionUsage
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionChunk,
+    ChatCompletionMessage,
+)
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+
+from app.core.config import settings
+
+_SENTENCES = [
+    "今日も一日おつかれさまでした。",
+    "その気持ちを言葉にできたこと自体が、とても大切な一歩です。",
+    "無理をせず、自分のペースで過ごしてくださいね。",
+    "小さなことでも、うれしかった瞬間を覚えておけるといいですね。",
+    "うまくいかない日があっても、あなたの価値は変わりません。",
+    "ゆっくり休んで、明日の自分に少しだけ期待してみましょう。",
+]
+
+
+def _digest(*parts) -> bytes:
+    return hashlib.sha256(repr(parts).encode("utf-8")).digest()
+
+
+class FakeLatency:
+    """設定された分布に従って待ち時間（秒）を返す"""
+
+    def __init__(self, mean: float, rng: random.Random):
+        self.mean = mean
+        self.rng = rng
+        self.distribution = settings.FAKE_LATENCY_DISTRIBUTION
+        self.jitter = settings.FAKE_LATENCY_JITTER
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return self.rng.uniform(
+                self.mean * (1 - self.jitter), self.mean * (1 + self.jitter)
+            )
+        if self.distribution == "lognormal":
+            # 平均が mean になるよう位置を合わせる（jitter は対数の標準偏差）
+            sigma = self.jitter
+            return self.rng.lognormvariate(math.log(self.mean) - sigma**2 / 2, sigma)
+        return self.mean
+
+
+class _FakeFailures:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.error_rate = settings.FAKE_ERROR_RATE
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def _error_response(status_code: int, headers: dict | None = None) -> httpx.Response:
+    request = httpx.Request("POST", "http://fake-openai.local/v1/chat/completions")
+    return httpx.Response(status_code, headers=headers, request=request)
+
+
+class _FakeStream:
+    """AsyncStream[ChatCompletionChunk] と同じように使える断片の列"""
+
+    def __init__(self, model: str, text: str, chunk_delay: float):
+        self.model = model
+        self.text = text
+        self.chunk_delay = chunk_delay
+        self.id = f"chatcmpl-fake-{_digest(text).hex()[:12]}"
+
+    def _chunk(self, content: str | None, finish_reason: str | None):
+        return ChatCompletionChunk(
+            id=self.id,
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model=self.model,
+            choices=[
+                ChunkChoice(
+                    index=0,
+                    delta=ChoiceDelta(content=content),
+                    finish_reason=finish_reason,
+                )
+            ],
+        )
+
+    async def __aiter__(self):
+        for i in range(0, len(self.text), 8):
+            await asyncio.sleep(self.chunk_delay)
+            yield self._chunk(self.text[i : i + 8], None)
+        yield self._chunk(None, "stop")
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class _FakeCompletions:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self.client = client
+
+    async def create(
+        self,
+        *,
+        model: str,
+        messages: list[dict],
+        max_tokens: int = 500,
+        stream: bool = False,
+        **kwargs,
+    ):
+        client = self.client
+        client.calls += 1
+        await asyncio.sleep(client.latency.sample())
+        if client.failures.should_fail():
+            client.errors += 1
+            if client.rng.random() < 0.5:
+                raise RateLimitError(
+                    "fake rate limit",
+                    response=_error_response(429, {"retry-after": "1"}),
+                    body=None,
+                )
+            raise InternalServerError(
+                "fake server error", response=_error_response(500), body=None
+            )
+
+        text = client.reply(messages, max_tokens)
+        if stream:
+            return _FakeStream(model, text, settings.FAKE_STREAM_CHUNK_DELAY)
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages)
+        return ChatCompletion(
+            id=f"chatcmpl-fake-{_digest(text).hex()[:12]}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[
+                Choice(
+                    index=0,
+                    finish_reason="stop",
+                    message=ChatCompletionMessage(role="assistant", content=text),
+                )
+            ],
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(text),
+                total_tokens=prompt_tokens + len(text),
+            ),
+        )
+
+
+class _FakeChat:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self.completions = _FakeCompletions(client)
+
+
+class FakeOpenAIClient:
+    """AsyncOpenAI のうちアプリが使う部分（chat.completions.create）だけを持つ代替"""
+
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random(settings.FAKE_SEED if seed is None else seed)
+        self.latency = FakeLatency(settings.FAKE_LLM_LATENCY, self.rng)
+        self.failures = _FakeFailures(self.rng)
+        self.chat = _FakeChat(self)
+        self.calls = 0
+        self.errors = 0
+
+    def reply(self, messages: list[dict], max_tokens: int) -> str:
+        digest = _digest(messages)
+        count = 2 + digest[0] % 3
+        text = "".join(
+            _SENTENCES[digest[i + 1] % len(_SENTENCES)] for i in range(count)
+        )
+        return text[:max_tokens]
+
+    def with_options(self, **kwargs) -> "FakeOpenAIClient":
+        return self
+
+    async def close(self) -> None:
+        pass
+
+
+def _png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    """単色のPNGを作る"""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return (
+            struct.pack(">I", len(data))
+            + body
+            + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+        )
+
+    row = b"\x00" + bytes(rgb) * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeImageModel:
+    """Imagen の代替。プロンプトから決まる色の画像を返す"""
+
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random(settings.FAKE_SEED if seed is None else seed)
+        self.latency = FakeLatency(settings.FAKE_IMAGE_LATENCY, self.rng)
+        self.failures = _FakeFailures(self.rng)
+        self.calls = 0
+        self.errors = 0
+
+    async def generate(self, prompt: str) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.failures.should_fail():
+            self.errors += 1
+            raise RuntimeError("fake image generation failure")
+        digest = _digest(prompt)
+        return _png(256, 256, (digest[0], digest[1], digest[2]))
@@ -1,28 +1,94 @@
 """
 Vertex AI Imagen APIを使用して画像を生成する
+
+画像生成は IMAGE_PROVIDER（vertex / fake）、保存先は STORAGE_PROVIDER で切り替える。
+
+vertexai.init・ストレージのクライアント・モデルの取得はプロセスで1度だけ行い、
+アプリのライフスパン開始時に作った生成器（init_image_generator）を使い回す。
+SDK のブロッキングな呼び出しは専用のスレッドプール（sdk_executor）で実行する。
 """
 
+import asyncio
+import logging
 import os
 
 # gRPCのDNSリゾルバをOS標準に切り替え（c-aresのDNS解決失敗を回避）
 os.environ.setdefault("GRPC_DNS_RESOLVER", "native")
-import base64
 from datetime import datetime
-import vertexai
-from vertexai.preview.vision_models import ImageGenerationModel
-from google.cloud import storage
 from app.core.config import settings
+from app.core.executor import sdk_executor
+from app.services.storage import ObjectStore, get_object_store
 
+logger = logging.getLogger(__name__)
 
-class ImageGenerator:
+
+class VertexImageModel:
     def __init__(self):
+        import vertexai
+        from vertexai.preview.vision_models import ImageGenerationModel
+
         # Vertex AI初期化
         vertexai.init(
             project=settings.GCP_PROJECT_ID,
             location=settings.GCP_LOCATION,
         )
-        self.storage_client = storage.Client()
-        self.bucket = self.storage_client.bucket(settings.GCS_BUCKET_NAME)
+        self._model_class = ImageGenerationModel
+        self._model = None
+        self._model_lock = asyncio.Lock()
+
+    async def warm(self) -> None:
+        """モデルを取得しておく（以降の生成では使い回す）"""
+        if self._model is not None:
+            return
+        async with self._model_lock:
+            if self._model is None:
+                self._model = await sdk_executor.run(
+                    "load_model",
+                    self._model_class.from_pretrained,
+                    settings.VERTEX_AI_MODEL,
+                )
+
+    def _generate(self, prompt: str) -> bytes:
+        # 画像生成リクエスト
+        response = self._model.generate_images(
+            prompt=prompt,
+            number_of_images=1,
+        )
+
+        # 生成された画像を取得
+        image = response.images[0]
+        return image._image_bytes
+
+    async def generate(self, prompt: str) -> bytes:
+        await self.warm()
+        # Vertex AI Imagen APIで画像生成
+        return await sdk_executor.run("generate", self._generate, prompt)
+
+
+def _build_image_model():
+    if settings.IMAGE_PROVIDER == "vertex":
+        return VertexImageModel()
+    if settings.IMAGE_PROVIDER == "fake":
+        from app.services.ml.fakes import FakeImageModel
+
+        return FakeImageModel()
+    raise ValueError(f"未対応の IMAGE_PROVIDER です: {settings.IMAGE_PROVIDER}")
+
+
+class ImageGenerator:
+    def __init__(self, model=None, store: ObjectStore | None = None):
+        self.model = model or _build_image_model()
+        self.store = store or get_object_store()
+
+    async def warm(self) -> None:
+        warm = getattr(self.model, "warm", None)
+        if warm is not None:
+            await warm()
+
+    async def generate_image(self, prompt: str, blob_name: str) -> str:
+        """プロンプトから画像を生成して blob_name に保存し、公開URLを返す"""
+        image_bytes = await self.model.generate(prompt)
+        return await self.store.upload(blob_name, image_bytes, "image/png")
 
     async def generate_flower_image(self, prompt: str, diary_id: int) -> str:
         """
@@ -33,34 +99,48 @@ class ImageGenerator:
             diary_id: 日記ID
 
         Returns:
-            生成された画像のGCS URL
+            生成された画像の公開URL
         """
         try:
-            # Vertex AI Imagen APIで画像生成
-            model = ImageGenerationModel.from_pretrained(settings.VERTEX_AI_MODEL)
+            # GCSに保存して公開URLを取得
+            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            blob_name = f"flowers/diary_{diary_id}_{timestamp}.png"
+            return await self.generate_image(prompt, blob_name)
+
+        except Exception as e:
+            raise Exception(f"画像生成エラー: {str(e)}")
 
-            # 画像生成リクエスト
-            response = model.generate_images(
-                prompt=prompt,
-                number_of_images=1,
-            )
 
-            # 生成された画像を取得
-            image = response.images[0]
-            image_bytes = image._image_bytes
+_generator: ImageGenerator | None = None
 
-            # GCSに保存
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            blob_name = f"flowers/diary_{diary_id}_{timestamp}.png"
-            blob = self.bucket.blob(blob_name)
 
-            blob.upload_from_string(image_bytes, content_type="image/png")
+async def init_image_generator() -> ImageGenerator | None:
+    """
+    ライフスパン開始時に生成器を作ってモデルを取得しておく。
+    認証情報がない環境でもAPI自体は起動できるよう、失敗してもログだけ出す
+    （その場合は最初の画像生成時に作り直す）。
+    """
+    global _generator
+    try:
+        generator = _generator or ImageGenerator()
+        await generator.warm()
+    except Exception as e:
+        logger.warning(f"画像生成の初期化に失敗しました: {str(e)}")
+        return None
+    _generator = generator
+    return _generator
 
-            # 公開URLを取得
-            blob.make_public()
-            image_url = blob.public_url
 
-            return image_url
+def get_image_generator() -> ImageGenerator:
+    """共有の生成器を返す（ライフスパン外では初回呼び出し時に作成）"""
+    global _generator
+    if _generator is None:
+        _generator = ImageGenerator()
+    return _generator
 
-        except Exception as e:
-            raise Exception(f"画像生成エラー: {str(e)}")
+
+def close_image_generator() -> None:
+    """ライフスパン終了時にSDK用のスレッドプールを止める"""
+    global _generator
+    _generator = None
+    sdk_executor.shutdown()
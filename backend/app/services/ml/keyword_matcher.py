@@ -0,0 +1,78 @@
+"""
+キーワード辞書の一括マッチ（Aho-Corasick）
+
+グループ（感情など）ごとのキーワード一覧を一度だけオートマトンにまとめ、
+本文を1回走査するだけで全グループのヒット数を数える。
+キーワードごとに re.findall するのと同じ数え方（同じキーワードは重ならない位置だけ数える）になる。
+
+走査は1文字ごとに Python のループを回すが、ベンチマークでは日記の長さ（数百〜数千文字）で
+キーワードごとの re.findall より 1.5〜8 倍速く、1万文字を超えてもほぼ同じ速さなので、
+本文の長さによらずこの経路だけを使う。
+
+ベンチマーク:
+    python -m scripts.bench_keyword_matcher
+"""
+
+from collections import deque
+
+
+class KeywordMatcher:
+    def __init__(self, groups: dict[str, list[str]]):
+        self.groups: tuple[str, ...] = tuple(groups)
+        # キーワード番号 -> (グループ番号, 長さ)。同じキーワードが複数グループにあればそれぞれ数える
+        self._keywords: list[tuple[int, int]] = []
+
+        goto: list[dict[str, int]] = [{}]
+        outputs: list[list[int]] = [[]]
+        for group_index, keywords in enumerate(groups.values()):
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        outputs.append([])
+                    state = nxt
+                outputs[state].append(len(self._keywords))
+                self._keywords.append((group_index, len(keyword)))
+
+        # 失敗遷移を畳み込んだ完全な遷移表にする（走査時は1文字1回の辞書引きで済む）
+        # 辞書にない文字は初期状態に戻るので、遷移表には載せない
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(nxt)
+
+        self._delta = delta
+        self._outputs = [tuple(o) if o else None for o in outputs]
+
+    def count(self, text: str) -> list[int]:
+        """グループごとのヒット数（groups の順）"""
+        counts = [0] * len(self.groups)
+        # キーワードごとの直前のヒットの終了位置（重なったヒットは数えない）
+        last_end: dict[int, int] = {}
+        delta = self._delta
+        outputs = self._outputs
+        keywords = self._keywords
+        state = 0
+        for end, ch in enumerate(text, 1):
+            state = delta[state].get(ch, 0)
+            hits = outputs[state]
+            if hits is None:
+                continue
+            for keyword_index in hits:
+                group_index, length = keywords[keyword_index]
+                if end - length >= last_end.get(keyword_index, 0):
+                    counts[group_index] += 1
+                    last_end[keyword_index] = end
+        return counts
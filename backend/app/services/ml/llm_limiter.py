@@ -0,0 +1,336 @@
+"""
+OpenAI 呼び出しの共有リミッタ
+
+各サービスがばらばらに OpenAI を呼ぶと、アクセスが集中したときに
+プロバイダのレート制限に一斉に当たり、全リクエストが同時に失敗する。
+呼び出しはすべてここを通し、モデルごとに次を制御する。
+
+- 同時実行数の上限（バックグラウンドが使える枠は LLM_INTERACTIVE_RESERVED だけ少ない）
+- requests/分・tokens/分 のトークンバケット（トークン数は事前に見積もり、応答の usage で補正）
+- 429 の Retry-After の間はそのモデルへの新規呼び出しを全体で止める
+- 優先度レーン: 待ち行列では対話（チャット等）がバックグラウンド（AIコメント等）より先に進む
+- 待ち時間が上限を超えたら LLMRejectedError で打ち切る
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Awaitable, Callable, TypeVar
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """待ち行列の優先度（値が小さいほど先に実行される）"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class LLMRejectedError(Exception):
+    """待ち時間の上限を超えて呼び出しを諦めた"""
+
+
+def count_tokens(text: str) -> int:
+    """
+    テキストのトークン数の見積もり。
+    日本語はおおむね1文字1トークン以下なので文字数をそのまま使う（多めに見積もる）。
+    """
+    return len(text)
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int) -> int:
+    """リクエストが消費するトークン数（プロンプト＋最大出力）の見積もり"""
+    prompt = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            prompt += count_tokens(content)
+            continue
+        for part in content:
+            # 画像（detail=low）は固定85トークン
+            prompt += (
+                count_tokens(part.get("text", "")) if part["type"] == "text" else 85
+            )
+    return prompt + max_tokens
+
+
+def _retry_after_seconds(error: RateLimitError) -> float | None:
+    headers = error.response.headers
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # HTTP-date 形式
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """1分あたり per_minute だけ連続的に補充されるトークンバケット"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount を消費できるようになるまでの秒数"""
+        self._refill()
+        # 容量を超える要求でも永久に待たないよう、満タンになれば通す
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        """見積もりとの差分を戻す（負の値なら追加で消費する）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _LaneStats:
+    def __init__(self):
+        self.acquired = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, wait_seconds: float):
+        self.acquired += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "wait_seconds_avg": (
+                self.wait_seconds_total / self.acquired if self.acquired else 0.0
+            ),
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class _ModelLimiter:
+    """1モデル分の同時実行数・レート・優先度付き待ち行列"""
+
+    def __init__(self, concurrency: int, rpm: float, tpm: float):
+        self.concurrency = concurrency
+        self.background_limit = max(1, concurrency - settings.LLM_INTERACTIVE_RESERVED)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.in_flight = {p: 0 for p in Priority}
+        self.stats = {p: _LaneStats() for p in Priority}
+        # (優先度, 到着順) のヒープ。先頭の呼び出しだけが実行可否を判定する
+        self._waiters: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+
+    def _delay(self, priority: Priority, tokens: int) -> float | None:
+        """
+        今すぐ実行できれば 0、時間経過で実行できるならその秒数、
+        実行中の呼び出しの終了を待つ必要があれば None を返す。
+        """
+        if sum(self.in_flight.values()) >= self.concurrency:
+            return None
+        if (
+            priority == Priority.BACKGROUND
+            and self.in_flight[Priority.BACKGROUND] >= self.background_limit
+        ):
+            return None
+        delays = [self.blocked_until - time.monotonic()]
+        if self.requests:
+            delays.append(self.requests.wait_time(1))
+        if self.tokens:
+            delays.append(self.tokens.wait_time(tokens))
+        return max(0.0, *delays)
+
+    async def acquire(self, priority: Priority, tokens: int, timeout: float):
+        entry = (int(priority), next(self._seq))
+        started = time.monotonic()
+        deadline = started + timeout
+        async with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    delay = (
+                        self._delay(priority, tokens)
+                        if self._waiters[0] == entry
+                        else None
+                    )
+                    if delay == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats[priority].rejected += 1
+                        raise LLMRejectedError(
+                            f"LLM呼び出しの待ち時間が上限（{timeout:.0f}秒）を超えました"
+                        )
+                    try:
+                        await asyncio.wait_for(
+                            self._cond.wait(),
+                            remaining if delay is None else min(delay, remaining),
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(tokens)
+            self.in_flight[priority] += 1
+            self.stats[priority].record_wait(time.monotonic() - started)
+            # 次の先頭の呼び出しに判定させる
+            self._cond.notify_all()
+
+    async def release(
+        self, priority: Priority, estimated_tokens: int, actual_tokens: int | None
+    ):
+        async with self._cond:
+            self.in_flight[priority] -= 1
+            if self.tokens and actual_tokens is not None:
+                self.tokens.refund(estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def block(self, seconds: float):
+        self.throttled += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": {p.name.lower(): n for p, n in self.in_flight.items()},
+            "queued": len(self._waiters),
+            "throttled": self.throttled,
+            "blocked_seconds": max(0.0, self.blocked_until - time.monotonic()),
+            "requests_available": (self.requests.tokens if self.requests else None),
+            "tokens_available": self.tokens.tokens if self.tokens else None,
+            "lanes": {p.name.lower(): s.snapshot() for p, s in self.stats.items()},
+        }
+
+
+class _Permit:
+    """limit() の中で応答の実トークン数を記録するためのオブジェクト"""
+
+    def __init__(self):
+        self.actual_tokens: int | None = None
+
+    def record_usage(self, response) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.actual_tokens = usage.total_tokens
+
+
+class LLMLimiter:
+    """モデルごとの _ModelLimiter をまとめるプロセス共有のリミッタ"""
+
+    def __init__(self):
+        self._models: dict[str, _ModelLimiter] = {}
+
+    def _get(self, model: str) -> _ModelLimiter:
+        limiter = self._models.get(model)
+        if limiter is None:
+            limits = settings.LLM_MODEL_LIMITS.get(model, {})
+            limiter = _ModelLimiter(
+                concurrency=limits.get("concurrency", settings.LLM_MAX_CONCURRENCY),
+                rpm=limits.get("rpm", settings.LLM_RPM),
+                tpm=limits.get("tpm", settings.LLM_TPM),
+            )
+            self._models[model] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def limit(self, model: str, estimated_tokens: int, priority: Priority):
+        """
+        実行枠を確保してから本体を実行する（ストリーミングのように枠を保持し続ける用途）。
+        本体で 429 が出たら Retry-After の間、そのモデルへの呼び出しを止める。
+        """
+        limiter = self._get(model)
+        timeout = (
+            settings.LLM_INTERACTIVE_QUEUE_TIMEOUT
+            if priority == Priority.INTERACTIVE
+            else settings.LLM_BACKGROUND_QUEUE_TIMEOUT
+        )
+        await limiter.acquire(priority, estimated_tokens, timeout)
+        permit = _Permit()
+        try:
+            yield permit
+        except RateLimitError as e:
+            delay = _retry_after_seconds(e) or settings.LLM_RETRY_BASE_DELAY
+            logger.warning(f"OpenAI レート制限（{model}）: {delay:.1f} 秒停止します")
+            limiter.block(delay)
+            raise
+        finally:
+            await limiter.release(priority, estimated_tokens, permit.actual_tokens)
+
+    async def call(
+        self,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        estimated_tokens: int,
+        priority: Priority,
+    ) -> T:
+        """
+        枠を確保して fn() を呼ぶ。429・一時的なエラーは LLM_MAX_RETRIES 回まで再試行する
+        （429 の待ちは limit() が設定した停止時間の間、次の acquire で行われる）。
+        """
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                async with self.limit(model, estimated_tokens, priority) as permit:
+                    response = await fn()
+                    permit.record_usage(response)
+                    return response
+            except RateLimitError:
+                if attempt == settings.LLM_MAX_RETRIES:
+                    raise
+            except (APIConnectionError, InternalServerError):
+                if attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                delay = settings.LLM_RETRY_BASE_DELAY * 2**attempt
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    def snapshot(self) -> dict:
+        return {model: limiter.snapshot() for model, limiter in self._models.items()}
+
+
+llm_limiter = LLMLimiter()
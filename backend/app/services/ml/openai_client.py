@@ -0,0 +1,64 @@
+"""
+プロセス共有の OpenAI クライアント
+
+リクエストごとに AsyncOpenAI を作ると毎回 TLS ハンドシェイクと
+新しいコネクションプールが発生するため、アプリのライフスパンで1つだけ作り、
+各サービスはそれを使い回す。
+
+LLM_PROVIDER=fake のときは、ネットワークに出ないローカルの代替（fakes.FakeOpenAIClient）を使う。
+"""
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+_client: AsyncOpenAI | None = None
+
+
+def _build_client() -> AsyncOpenAI:
+    if settings.LLM_PROVIDER == "fake":
+        from app.services.ml.fakes import FakeOpenAIClient
+
+        return FakeOpenAIClient()
+    if settings.LLM_PROVIDER != "openai":
+        raise ValueError(f"未対応の LLM_PROVIDER です: {settings.LLM_PROVIDER}")
+
+    http_client = httpx.AsyncClient(
+        http2=settings.OPENAI_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT
+        ),
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        http_client=http_client,
+        # 再試行は LLM_MAX_RETRIES に従ってリミッタが行う（SDK 側でも再試行すると回数が掛け算になる）
+        max_retries=0,
+    )
+
+
+def init_openai_client() -> AsyncOpenAI:
+    """ライフスパン開始時に共有クライアントを作成する"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """共有クライアントを返す（ライフスパン外のCLI等では初回呼び出し時に作成）"""
+    return _client or init_openai_client()
+
+
+async def close_openai_client() -> None:
+    """ライフスパン終了時にコネクションプールを閉じる"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
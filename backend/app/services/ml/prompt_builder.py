@@ -4,11 +4,12 @@
 プロンプト定義は prompts/flower_prompts.txt で管理
 """
 
-import re
+import logging
+
+from app.services.ml.keyword_matcher import KeywordMatcher
 from prompts import load_flower_prompts
 
-# prompts/flower_prompts.txt からプロンプトを読み込む
-_FLOWER_PROMPTS = load_flower_prompts()
+logger = logging.getLogger(__name__)
 
 # 感情 → キーワードマッピング（プロンプト本体はファイル管理）
 EMOTION_KEYWORDS: dict[str, list[str]] = {
@@ -149,6 +150,12 @@ EMOTION_KEYWORDS: dict[str, list[str]] = {
     ],
 }
 
+# 感情カテゴリの並び（score_emotions が返すスコアの順）
+EMOTIONS: tuple[str, ...] = tuple(EMOTION_KEYWORDS)
+
+# 全キーワードを1つのオートマトンにまとめておく（本文の走査は1回で済む）
+EMOTION_MATCHER = KeywordMatcher(EMOTION_KEYWORDS)
+
 # mood選択 → 感情カテゴリのマッピング
 MOOD_EMOTION_MAP = {
     "happy": "joy",
@@ -166,44 +173,64 @@ class PromptBuilder:
     def __init__(self):
         pass
 
-    def analyze_emotion_and_build_prompt(
-        self, diary_content: str, mood: str = None
-    ) -> str:
+    @staticmethod
+    def score_emotions(diary_content: str) -> list[int]:
+        """感情カテゴリごとのキーワードのヒット数（EMOTIONS の順）"""
+        return EMOTION_MATCHER.count(diary_content.lower())
+
+    def classify_emotion(self, diary_content: str, mood: str = None) -> str:
         """
-        キーワードベースで日記の感情を分析し、花の画像生成用プロンプトを作成
+        日記の感情カテゴリ（flower_prompts.txt のセクション名）を返す
 
         Args:
             diary_content: 日記の本文
             mood: ユーザーが選択した気分（オプション）
 
         Returns:
-            Vertex AI Imagen用のプロンプト文字列
+            感情カテゴリ。どれにもマッチしなければ "default"
         """
         # 1. moodが指定されていればそれを優先
         if mood and mood.lower() in MOOD_EMOTION_MAP:
             emotion_key = MOOD_EMOTION_MAP[mood.lower()]
-            print(f"感情分析(mood指定): {mood} → {emotion_key}")
-            return _FLOWER_PROMPTS.get(emotion_key, _FLOWER_PROMPTS.get("default", ""))
+            logger.debug(f"感情分析(mood指定): {mood} → {emotion_key}")
+            return emotion_key
 
         # 2. 日記本文からキーワードマッチで感情を判定
-        scores: dict[str, int] = {}
-        content_lower = diary_content.lower()
-
-        for emotion, keywords in EMOTION_KEYWORDS.items():
-            score = sum(
-                len(re.findall(re.escape(kw), content_lower)) for kw in keywords
-            )
-            if score > 0:
-                scores[emotion] = score
+        scores = {
+            emotion: score
+            for emotion, score in zip(EMOTIONS, self.score_emotions(diary_content))
+            if score > 0
+        }
 
         if scores:
             best_emotion = max(scores, key=scores.get)
-            print(f"感情分析(キーワード): {scores} → {best_emotion}")
-            return _FLOWER_PROMPTS.get(best_emotion, _FLOWER_PROMPTS.get("default", ""))
+            logger.debug(f"感情分析(キーワード): {scores} → {best_emotion}")
+            return best_emotion
 
         # 3. どれにもマッチしなければデフォルト
-        print("感情分析: マッチなし → デフォルトプロンプト")
-        return _FLOWER_PROMPTS.get("default", "")
+        logger.debug("感情分析: マッチなし → デフォルトプロンプト")
+        return "default"
+
+    @staticmethod
+    def prompt_for(emotion_key: str) -> str:
+        """感情カテゴリの花のプロンプト（ファイルが更新されれば反映される）"""
+        flower_prompts = load_flower_prompts()
+        return flower_prompts.get(emotion_key, flower_prompts.get("default", ""))
+
+    def analyze_emotion_and_build_prompt(
+        self, diary_content: str, mood: str = None
+    ) -> str:
+        """
+        キーワードベースで日記の感情を分析し、花の画像生成用プロンプトを作成
+
+        Args:
+            diary_content: 日記の本文
+            mood: ユーザーが選択した気分（オプション）
+
+        Returns:
+            Vertex AI Imagen用のプロンプト文字列
+        """
+        return self.prompt_for(self.classify_emotion(diary_content, mood))
 
     @staticmethod
     def build_flower_prompt(diary_content: str, diary_title: str = "") -> str:
@@ -0,0 +1,208 @@
+"""
+OpenAI 応答のコンテンツアドレス型キャッシュ
+
+同じ日記への感情ログの再送信や、ジョブのリトライで同じ内容のコメントを
+生成し直すと、そのたびに LLM の待ち時間とトークンを消費する。
+リクエスト内容（モデル・メッセージ・max_tokens）のハッシュをキーに応答を保存し、
+同じリクエストには保存済みの応答を返す。
+
+- メモリ層: プロセス内の LRU（LLM_CACHE_MAX_ENTRIES 件）
+- DB層    : llm_response_cache テーブル（LLM_CACHE_TTL 秒で期限切れ。プロセス間で共有）
+
+キャッシュの読み書きに失敗しても生成は続行する。
+期限切れの行は次のコマンドで削除する:
+    python -m app.services.ml.response_cache
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal, async_engine
+from app.models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(model: str, messages: list[dict], max_tokens: int) -> str:
+    """リクエスト内容から決まるキャッシュキー"""
+    raw = json.dumps(
+        [model, messages, max_tokens], ensure_ascii=False, sort_keys=True
+    ).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (有効期限(monotonic), 応答)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _get_memory(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put_memory(self, key: str, response: str, ttl_seconds: float):
+        self._entries[key] = (time.monotonic() + ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_db(
+        self, key: str, db: AsyncSession | None
+    ) -> tuple[str, datetime] | None:
+        stmt = select(LLMCacheEntry.response, LLMCacheEntry.expires_at).where(
+            LLMCacheEntry.key == key,
+            LLMCacheEntry.expires_at > datetime.utcnow(),
+        )
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(stmt)).first()
+        else:
+            row = (await db.execute(stmt)).first()
+        return tuple(row) if row else None
+
+    async def _put_db(
+        self, key: str, model: str, response: str, db: AsyncSession | None
+    ):
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                await self._upsert(db, key, model, response)
+                await db.commit()
+            return
+        # 呼び出し側のトランザクション内のセーブポイントで書く
+        # （失敗しても呼び出し側のトランザクションは続行でき、コミットは呼び出し側に任せる）
+        async with db.begin_nested():
+            await self._upsert(db, key, model, response)
+
+    async def _upsert(self, db: AsyncSession, key: str, model: str, response: str):
+        now = datetime.utcnow()
+        insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(LLMCacheEntry).values(
+            key=key,
+            model=model,
+            response=response,
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl_seconds),
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[LLMCacheEntry.key],
+                set_={
+                    "response": stmt.excluded.response,
+                    "created_at": stmt.excluded.created_at,
+                    "expires_at": stmt.excluded.expires_at,
+                },
+            )
+        )
+
+    async def get_or_generate(
+        self,
+        key: str,
+        model: str,
+        generate: Callable[[], Awaitable[str]],
+        bypass: bool = False,
+        db: AsyncSession | None = None,
+    ) -> str:
+        """
+        キャッシュ済みの応答を返し、なければ generate() で生成して保存する。
+        bypass=True のときはキャッシュを読まずに生成し、結果で上書きする。
+
+        db を渡すとそのセッションのトランザクション内で読み書きする（1リクエストで
+        接続を2本使わずに済む）。single_flight で共有する処理のように、呼び出し元の
+        リクエストより長く続きうる処理では渡さない（db=None なら読み書きのたびに短い
+        セッションを開き、生成中は接続を保持しない）。
+        """
+        enabled = settings.LLM_CACHE_ENABLED
+        if enabled and not bypass:
+            response = self._get_memory(key)
+            if response is not None:
+                self.memory_hits += 1
+                return response
+            try:
+                row = await self._get_db(key, db)
+            except Exception as e:
+                logger.warning(f"応答キャッシュの読み込みに失敗しました: {str(e)}")
+                row = None
+            if row is not None:
+                self.db_hits += 1
+                response, expires_at = row
+                ttl = (expires_at - datetime.utcnow()).total_seconds()
+                self._put_memory(key, response, ttl)
+                return response
+
+        if bypass:
+            self.bypassed += 1
+        else:
+            self.misses += 1
+        response = await generate()
+        if enabled and response:
+            self._put_memory(key, response, self.ttl_seconds)
+            try:
+                await self._put_db(key, model, response, db)
+            except Exception as e:
+                logger.warning(f"応答キャッシュの保存に失敗しました: {str(e)}")
+        return response
+
+    def snapshot(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "memory_entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": (
+                (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            ),
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES, ttl_seconds=settings.LLM_CACHE_TTL
+)
+
+
+async def purge_expired() -> int:
+    """期限切れのキャッシュ行を削除し、削除件数を返す"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.utcnow())
+        )
+        await db.commit()
+    return result.rowcount
+
+
+async def _main() -> int:
+    try:
+        return await purge_expired()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    count = asyncio.run(_main())
+    print(f"期限切れの応答キャッシュを削除しました: {count} 件")
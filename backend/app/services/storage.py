@@ -0,0 +1,100 @@
+"""
+画像・写真の保存先（オブジェクトストア）
+
+STORAGE_PROVIDER で切り替える:
+- gcs  : Cloud Storage（本番）
+- local: ローカルのファイルシステム（オフラインでの負荷試験・開発用）
+         LOCAL_STORAGE_DIR に保存し、アプリの /local-storage から配信する
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+from app.core.config import settings
+from app.core.executor import sdk_executor
+
+
+class ObjectStore(ABC):
+    @abstractmethod
+    async def upload(self, name: str, data: bytes, content_type: str) -> str:
+        """オブジェクトを保存し、公開URLを返す"""
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        """オブジェクトを削除する（存在しなければ何もしない）"""
+
+
+class GCSObjectStore(ObjectStore):
+    def __init__(self, bucket_name: str):
+        from google.cloud import storage
+
+        self.bucket = storage.Client().bucket(bucket_name)
+
+    def _upload(self, name: str, data: bytes, content_type: str) -> str:
+        blob = self.bucket.blob(name)
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+    async def upload(self, name: str, data: bytes, content_type: str) -> str:
+        # SDK の呼び出しはブロッキングなので専用のスレッドプールで行う
+        return await sdk_executor.run("upload", self._upload, name, data, content_type)
+
+    def _delete(self, name: str) -> None:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.bucket.blob(name).delete()
+        except NotFound:
+            pass
+
+    async def delete(self, name: str) -> None:
+        await sdk_executor.run("delete", self._delete, name)
+
+
+class LocalObjectStore(ObjectStore):
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _upload(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 書き込み途中のファイルを配信しないよう、一時ファイルから置き換える
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def upload(self, name: str, data: bytes, content_type: str) -> str:
+        await sdk_executor.run("upload", self._upload, name, data)
+        return f"{self.base_url}/{name}"
+
+    def _delete(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, name: str) -> None:
+        await sdk_executor.run("delete", self._delete, name)
+
+
+_store: ObjectStore | None = None
+
+
+def get_object_store() -> ObjectStore:
+    """設定に応じたオブジェクトストアを返す（プロセスで1つ）"""
+    global _store
+    if _store is None:
+        if settings.STORAGE_PROVIDER == "gcs":
+            _store = GCSObjectStore(settings.GCS_BUCKET_NAME)
+        elif settings.STORAGE_PROVIDER == "local":
+            _store = LocalObjectStore(
+                settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_BASE_URL
+            )
+        else:
+            raise ValueError(
+                f"未対応の STORAGE_PROVIDER です: {settings.STORAGE_PROVIDER}"
+            )
+    return _store
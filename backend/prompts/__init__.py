@@ -1,26 +1,43 @@
+"""
+プロンプトファイルの読み込み
+
+各ファイルは初回に1度だけ読み込み・パースしてメモリに保持する。
+ファイルの更新日時（mtime）とサイズを check_interval 秒ごとに確認し、
+変わっていれば読み込み直すので、プロンプトの修正は再起動なしで反映される。
+start_watcher() でバックグラウンドのスレッドが確認を行う場合、読み込み側はファイルに触れない。
+
+各プロンプトには内容のハッシュ（version）が付き、再読み込みの判定と
+/internal/prompts での確認に使う。応答キャッシュ・花画像プールのキーは
+描画後のプロンプト自体のハッシュなので、プロンプトを変えればそのまま無効化される。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable
 
+logger = logging.getLogger(__name__)
 
-def load_prompt(file_name: str) -> str:
-    """テキストファイルをそのまま文字列で返す（後方互換用）"""
-    prompt_path = Path(__file__).parent / file_name
+PROMPTS_DIR = Path(__file__).parent
 
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read().strip()
 
+def _parse_text(text: str) -> str:
+    return text.strip()
 
-def load_flower_prompts() -> dict[str, str]:
+
+def _parse_flower_prompts(text: str) -> dict[str, str]:
     """
-    flower_prompts.txt を読み込み、感情キー→プロンプト文字列の辞書を返す。
+    感情キー→プロンプト文字列の辞書にする。
     すべての値末尾に [style_suffix] が自動付与される。
     """
-    prompt_path = Path(__file__).parent / "flower_prompts.txt"
-    lines = prompt_path.read_text(encoding="utf-8").splitlines()
-
     sections: dict[str, list[str]] = {}
     current: str | None = None
 
-    for line in lines:
+    for line in text.splitlines():
         stripped = line.strip()
         # コメント・空行はスキップ
         if not stripped or stripped.startswith("#"):
@@ -40,3 +57,131 @@ def load_flower_prompts() -> dict[str, str]:
 
     return result
 
+
+# ファイルごとのパーサ（登録がなければ前後の空白を除いた文字列）
+_PARSERS: dict[str, Callable[[str], Any]] = {
+    "flower_prompts.txt": _parse_flower_prompts,
+}
+
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    value: Any
+    # ファイル内容の sha256（先頭16桁）
+    version: str
+    mtime_ns: int
+    size: int
+
+
+class PromptRegistry:
+    def __init__(self, directory: Path = PROMPTS_DIR, check_interval: float = 2.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._prompts: dict[str, Prompt] = {}
+        self._checked_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reloads = 0
+
+    def _load(self, name: str, stat: os.stat_result) -> Prompt:
+        raw = (self.directory / name).read_bytes()
+        value = _PARSERS.get(name, _parse_text)(raw.decode("utf-8"))
+        return Prompt(
+            name=name,
+            value=value,
+            version=hashlib.sha256(raw).hexdigest()[:16],
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+
+    def _revalidate(self, name: str) -> Prompt:
+        """ファイルが変わっていれば読み込み直す（失敗したら前の内容を使い続ける）"""
+        with self._lock:
+            current = self._prompts.get(name)
+            self._checked_at[name] = time.monotonic()
+            try:
+                stat = os.stat(self.directory / name)
+                if current and (stat.st_mtime_ns, stat.st_size) == (
+                    current.mtime_ns,
+                    current.size,
+                ):
+                    return current
+                prompt = self._load(name, stat)
+            except Exception as e:
+                if current is None:
+                    raise
+                logger.warning(
+                    f"プロンプト {name} の再読み込みに失敗しました: {str(e)}"
+                )
+                return current
+            if current is not None and prompt.version != current.version:
+                self.reloads += 1
+                logger.info(f"プロンプト {name} を再読み込みしました: {prompt.version}")
+            self._prompts[name] = prompt
+            return prompt
+
+    def get(self, name: str) -> Prompt:
+        """プロンプトを返す（ウォッチャーがなければ check_interval ごとに更新を確認する）"""
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            return self._revalidate(name)
+        if (
+            self._watcher is None
+            and time.monotonic() - self._checked_at[name] >= self.check_interval
+        ):
+            return self._revalidate(name)
+        return prompt
+
+    def refresh(self) -> None:
+        """読み込み済みのすべてのプロンプトの更新を確認する"""
+        for name in list(self._prompts):
+            self._revalidate(name)
+
+    def start_watcher(self, interval: float | None = None) -> None:
+        """バックグラウンドのスレッドで定期的に更新を確認する"""
+        if self._watcher is not None:
+            return
+        interval = interval or self.check_interval
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"プロンプトの更新確認に失敗しました: {str(e)}")
+
+        self._watcher = threading.Thread(target=run, name="prompt-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def snapshot(self) -> dict:
+        return {
+            "watching": self._watcher is not None,
+            "reloads": self.reloads,
+            "prompts": {
+                name: {"version": prompt.version, "size": prompt.size}
+                for name, prompt in self._prompts.items()
+            },
+        }
+
+
+prompt_registry = PromptRegistry()
+
+
+def load_prompt(file_name: str) -> str:
+    """テキストファイルの内容を文字列で返す（メモリ上のものを返す）"""
+    return prompt_registry.get(file_name).value
+
+
+def load_flower_prompts() -> dict[str, str]:
+    """flower_prompts.txt の感情キー→プロンプト文字列の辞書を返す"""
+    return prompt_registry.get("flower_prompts.txt").value
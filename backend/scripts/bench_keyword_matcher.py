@@ -0,0 +1,61 @@
+"""
+感情キーワードのカウント（KeywordMatcher）のベンチマーク
+
+置き換え前の実装（キーワードごとに re.findall）と count()（オートマトン）を本文の長さ別に比べる。
+
+    python -m scripts.bench_keyword_matcher
+"""
+
+import re
+import time
+
+from app.services.ml.prompt_builder import EMOTION_KEYWORDS, EMOTION_MATCHER
+
+SAMPLE = (
+    "今日は朝から雨で少し憂鬱だったけど、友達とお茶をして気分が落ち着いた。"
+    "仕事のプレッシャーで不安もあるけれど、目標に向かって頑張りたい。"
+    "帰り道にイライラすることもあったが、家族にありがとうと言えて幸せな一日だった。"
+    "I was worried at first, but it turned out to be a great and calm day. "
+)
+
+
+def count_with_regex(text: str) -> list[int]:
+    """置き換え前の実装（キーワードごとに re.findall）"""
+    return [
+        sum(len(re.findall(re.escape(kw), text)) for kw in keywords)
+        for keywords in EMOTION_KEYWORDS.values()
+    ]
+
+
+def _time(fn, text: str, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        fn(text)
+    return (time.perf_counter() - started) / loops * 1e6
+
+
+def main() -> None:
+    candidates = {
+        "re.findall": count_with_regex,
+        "count()": EMOTION_MATCHER.count,
+    }
+    for repeat in (1, 3, 5, 10, 100):
+        text = (SAMPLE * repeat).lower()
+        expected = count_with_regex(text)
+        loops = max(1, 2000 // repeat)
+        timings = {}
+        for name, fn in candidates.items():
+            assert fn(text) == expected, name
+            timings[name] = _time(fn, text, loops)
+        baseline = timings["re.findall"]
+        print(
+            f"{len(text):>6} 文字: "
+            + " / ".join(
+                f"{name} {us:8.1f} µs ({baseline / us:.1f}x)"
+                for name, us in timings.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+日別ロールアップ（user_daily_stats）の再構築のテスト
+
+再構築中もダッシュボードが読めるよう、テーブルを空にせず (ユーザー, 日付) ごとに置き換える。
+"""
+
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db import AsyncSessionLocal, engine
+from app.models import UserDailyStats
+from app.services.daily_stats import rebuild_daily_stats
+
+COLUMNS = [
+    "user_id",
+    "date",
+    "diary_tension_sum",
+    "diary_tension_count",
+    "diary_tension_min",
+    "diary_tension_max",
+    "emotion_count",
+    "emotion_tension_sum",
+    "low_count",
+    "normal_count",
+    "high_count",
+    "factor_counts",
+]
+
+
+def _rollups() -> list[tuple]:
+    with Session(engine) as db:
+        rows = db.scalars(
+            select(UserDailyStats).order_by(UserDailyStats.user_id, UserDailyStats.date)
+        )
+        return [tuple(getattr(row, column) for column in COLUMNS) for row in rows]
+
+
+async def _rebuild() -> int:
+    async with AsyncSessionLocal() as db:
+        return await rebuild_daily_stats(db)
+
+
+def test_rebuild_replaces_rows_without_emptying_the_table(client, capture_queries):
+    # シードは一部の日記を直接 INSERT しているので、一度作り直した状態を正とする
+    client.portal.call(_rebuild)
+    expected = _rollups()
+    assert expected
+
+    # 値のずれた行と、元データのない日の行を作る
+    with Session(engine) as db:
+        row = db.scalar(
+            select(UserDailyStats)
+            .order_by(UserDailyStats.user_id, UserDailyStats.date)
+            .limit(1)
+        )
+        row.diary_tension_sum += 1000
+        row.emotion_count += 3
+        db.add(
+            UserDailyStats(
+                user_id=1,
+                date=date(2000, 1, 1),
+                diary_tension_sum=50,
+                diary_tension_count=1,
+                emotion_count=0,
+                emotion_tension_sum=0,
+                low_count=0,
+                normal_count=0,
+                high_count=0,
+                factor_counts={},
+            )
+        )
+        db.commit()
+
+    with capture_queries() as queries:
+        days = client.portal.call(_rebuild)
+
+    assert days == len(expected) + 1
+    assert _rollups() == expected
+    deletes = [
+        statement
+        for statement, _ in queries
+        if statement.lstrip().upper().startswith("DELETE FROM USER_DAILY_STATS")
+    ]
+    # 削除は元データがなくなった行だけ（テーブル全体・ユーザー全体は消さない）
+    assert len(deletes) == 1
+    assert "user_daily_stats.date =" in deletes[0]
@@ -0,0 +1,42 @@
+"""
+一括の感情スコア（BatchKeywordCounter）が1件ずつのカウントと一致することのテスト
+"""
+
+import re
+
+import numpy as np
+
+from app.services.ml.emotion_scoring import BatchKeywordCounter, score_chunk
+from app.services.ml.prompt_builder import EMOTION_MATCHER
+
+TEXTS = [
+    "今日は朝から雨で少し憂鬱だったけど、友達とお茶をして気分が落ち着いた。",
+    "",
+    "仕事のプレッシャーで不安もあるけれど、目標に向かって頑張りたい。\n改行のあとも嬉しい",
+    "帰り道にイライラすることもあったが、家族にありがとうと言えて幸せな一日だった。"
+    * 20,
+    "I was WORRIED at first, but it turned out to be a great and calm day.",
+    "特に何もない日だった。",
+]
+
+
+def test_score_chunk_matches_per_diary_counts():
+    expected = [EMOTION_MATCHER.count(text.lower()) for text in TEXTS]
+    assert score_chunk(TEXTS).tolist() == expected
+    assert score_chunk([]).shape == (0, len(EMOTION_MATCHER.groups))
+
+
+def test_overlapping_hits_are_counted_per_keyword():
+    # 重なるヒットは同じキーワード内では数えず、別のキーワード・別のグループでは数える
+    groups = {"a": ["aa", "aaa"], "b": ["aa"]}
+    texts = ["aaaaa", "a", "aaa\naaa", "baab"]
+    expected = [
+        [
+            sum(len(re.findall(re.escape(kw), text)) for kw in keywords)
+            for keywords in groups.values()
+        ]
+        for text in texts
+    ]
+    counts = BatchKeywordCounter(groups).count(texts)
+    assert isinstance(counts, np.ndarray)
+    assert counts.tolist() == expected == [[3, 2], [0, 0], [4, 2], [1, 1]]
@@ -0,0 +1,22 @@
+"""
+感情ログサマリーの logs の件数・並び順のテスト
+
+既定では全件を古い順で返し、limit を指定したときだけ直近の件数に絞る。
+"""
+
+
+def test_summary_returns_every_log_by_default(client):
+    r = client.get("/api/v1/emotions/summary")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["total"] > 3
+    assert len(body["logs"]) == body["total"]
+    dates = [log["date"] for log in body["logs"]]
+    assert dates == sorted(dates)
+
+
+def test_summary_limit_keeps_the_most_recent_logs(client):
+    logs = client.get("/api/v1/emotions/summary").json()["logs"]
+    r = client.get("/api/v1/emotions/summary", params={"limit": 3})
+    assert r.status_code == 200, r.text
+    assert r.json()["logs"] == logs[-3:]
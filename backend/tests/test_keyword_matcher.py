@@ -0,0 +1,38 @@
+"""
+KeywordMatcher のカウントがキーワードごとの re.findall と一致することのテスト
+"""
+
+import re
+
+import pytest
+
+from app.services.ml.keyword_matcher import KeywordMatcher
+from app.services.ml.prompt_builder import EMOTION_KEYWORDS, EMOTION_MATCHER
+
+SAMPLE = (
+    "今日は朝から雨で少し憂鬱だったけど、友達とお茶をして気分が落ち着いた。"
+    "帰り道にイライラすることもあったが、家族にありがとうと言えて幸せな一日だった。"
+    "I was worried at first, but it turned out to be a great and calm day. "
+)
+
+
+def _count_with_regex(groups: dict[str, list[str]], text: str) -> list[int]:
+    return [
+        sum(len(re.findall(re.escape(kw), text)) for kw in keywords)
+        for keywords in groups.values()
+    ]
+
+
+@pytest.mark.parametrize("repeat", [1, 5, 50])
+def test_emotion_counts_match_regex(repeat):
+    text = (SAMPLE * repeat).lower()
+    expected = _count_with_regex(EMOTION_KEYWORDS, text)
+    assert EMOTION_MATCHER.count(text) == expected
+
+
+def test_overlapping_and_shared_keywords():
+    # 重なるヒットは同じキーワード内では数えず、別のキーワード・別のグループでは数える
+    groups = {"a": ["aa", "aaa"], "b": ["aa"]}
+    matcher = KeywordMatcher(groups)
+    text = "aaaaa"
+    assert matcher.count(text) == _count_with_regex(groups, text) == [3, 2]
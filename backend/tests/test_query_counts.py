@@ -0,0 +1,43 @@
+"""
+一覧・詳細エンドポイントのクエリ件数の回帰テスト
+
+画像（flower_images）を日記ごとに遅延ロードすると、ページの件数だけ SELECT が増える（N+1）。
+ページサイズを変えても件数が変わらず、上限以内であることを確かめる。
+"""
+
+from datetime import datetime
+
+import pytest
+
+_now = datetime.utcnow()
+
+# (パス, パラメータ, 上限)。ページサイズは limit で変える
+LIST_CASES = [
+    ("/api/v1/diaries/", {}, 1),
+    ("/api/v1/diaries/monthly", {"year": _now.year, "month": _now.month}, 1),
+    ("/api/v1/admin/diaries", {}, 1),
+    # ユーザーの存在確認・日記・最新の画像
+    ("/api/v1/admin/users/2/diaries", {}, 3),
+    ("/api/v1/chat/history", {}, 2),
+]
+
+
+@pytest.mark.parametrize("path, params, max_queries", LIST_CASES)
+def test_list_query_count_does_not_grow_with_page_size(
+    client, assert_max_queries, path, params, max_queries
+):
+    counts = []
+    for limit in (2, 50):
+        with assert_max_queries(max_queries) as queries:
+            r = client.get(path, params={**params, "limit": limit})
+        assert r.status_code == 200, r.text
+        counts.append(len(queries))
+    assert counts[0] == counts[1], f"ページサイズでクエリ件数が変わります: {counts}"
+
+
+def test_diary_detail_loads_latest_image_in_one_query(client, assert_max_queries):
+    # 偶数IDの日記には画像が2枚ある（conftest の _seed）
+    with assert_max_queries(2):
+        r = client.get("/api/v1/diaries/2")
+    assert r.status_code == 200, r.text
+    assert r.json()["flower_image"] is not None
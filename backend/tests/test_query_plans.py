@@ -0,0 +1,93 @@
+"""
+一覧・集計エンドポイントのクエリがインデックスを使っているかの回帰テスト
+
+各エンドポイントが実際に発行した SELECT を、同じパラメータで EXPLAIN し、
+- 大きくなるテーブルを全件走査（SQLite: SCAN <table> / Postgres: Seq Scan）していない
+- 想定したインデックスを使っている
+ことを確かめる。Postgres はテスト用の少ない行数だと全件走査を選ぶので、
+enable_seqscan を切って「使えるインデックスがあるか」を見る。
+"""
+
+import re
+from datetime import datetime
+
+import pytest
+
+from app.db import async_engine
+
+# 行数がユーザー数・日記数に比例して増えるテーブル
+LARGE_TABLES = {
+    "diaries",
+    "chat_messages",
+    "flower_images",
+    "emotion_logs",
+    "user_daily_stats",
+}
+
+_now = datetime.utcnow()
+_month = {"year": _now.year, "month": _now.month}
+
+CASES = [
+    ("/api/v1/diaries/", {"limit": 5}, ["ix_diaries_user_id_created_at_id"]),
+    ("/api/v1/diaries/monthly", _month, ["ix_diaries_user_id_created_at_id"]),
+    ("/api/v1/diaries/statistics", _month, []),
+    ("/api/v1/chat/history", {}, ["ix_chat_messages_user_id_created_at_id"]),
+    ("/api/v1/emotions/summary", {}, ["ix_emotion_logs_user_id_created_at_id"]),
+    (
+        "/api/v1/emotions/summary",
+        {"limit": 3},
+        ["ix_emotion_logs_user_id_created_at_id"],
+    ),
+    (
+        "/api/v1/admin/diaries",
+        {"limit": 5},
+        ["ix_diaries_created_at_id", "ix_flower_images_diary_id_created_at"],
+    ),
+    (
+        "/api/v1/admin/users/2/diaries",
+        {},
+        ["ix_diaries_user_id_created_at_id", "ix_flower_images_diary_id_created_at"],
+    ),
+]
+
+
+async def _explain(statements: list[tuple[str, object]]) -> list[str]:
+    plans = []
+    async with async_engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            prefix = "EXPLAIN " if postgres else "EXPLAIN QUERY PLAN "
+            rows = (await conn.exec_driver_sql(prefix + statement, parameters)).all()
+            # SQLite は (id, parent, notused, detail)、Postgres は1列
+            plans.append("\n".join(str(row[-1]) for row in rows))
+        await conn.rollback()
+    return plans
+
+
+def _full_scans(plan: str) -> list[str]:
+    sqlite = re.findall(r"^SCAN (\w+)$", plan, flags=re.MULTILINE)
+    postgres = re.findall(r"Seq Scan on (\w+)", plan)
+    return [table for table in sqlite + postgres if table in LARGE_TABLES]
+
+
+@pytest.mark.parametrize("path, params, indexes", CASES)
+def test_endpoint_queries_use_indexes(client, capture_queries, path, params, indexes):
+    with capture_queries() as queries:
+        r = client.get(path, params=params)
+    assert r.status_code == 200, r.text
+
+    selects = [
+        (statement, parameters)
+        for statement, parameters in queries
+        if statement.lstrip().upper().startswith(("SELECT", "WITH"))
+    ]
+    assert selects, f"{path} がSELECTを発行していません"
+    plans = client.portal.call(_explain, selects)
+
+    for (statement, _), plan in zip(selects, plans):
+        assert not _full_scans(plan), f"全件走査:\n{statement}\n{plan}"
+    combined = "\n".join(plans)
+    for index in indexes:
+        assert index in combined, f"{index} が使われていません:\n{combined}"
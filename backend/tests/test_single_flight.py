@@ -0,0 +1,84 @@
+"""
+相乗り（single-flight）した生成処理が、最初のリクエストのキャンセル後も完了することのテスト
+
+共有の処理は最初のリクエストより長く続くので、そのリクエストのセッション
+（get_db がキャンセル時に閉じる）を使ってはいけない。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.api.v1.endpoints.emotions import EmotionLogCreate, create_emotion_log
+from app.core.singleflight import single_flight
+from app.db import async_engine, engine, get_db
+from app.models import EmotionLog, LLMCacheEntry
+from app.services.ml.fakes import _FakeCompletions
+
+FOLLOWERS = 2
+
+
+def _cache_rows() -> int:
+    with Session(engine) as db:
+        return db.scalar(select(func.count()).select_from(LLMCacheEntry))
+
+
+async def _cancel_leader(diary_id: int, gate: asyncio.Event, started: asyncio.Event):
+    body = EmotionLogCreate(diary_id=diary_id, tension=10, factors=["sleep"])
+
+    async def request():
+        # FastAPI と同じく、リクエストが終わる（キャンセルされる）とセッションを閉じる
+        async with asynccontextmanager(get_db)() as db:
+            return await create_emotion_log(body, regenerate=False, db=db)
+
+    coalesced = single_flight.snapshot()["operations"]["emotion_analysis"]["coalesced"]
+    leader = asyncio.create_task(request())
+    await asyncio.wait_for(started.wait(), 5)
+    followers = [asyncio.create_task(request()) for _ in range(FOLLOWERS)]
+    while (
+        single_flight.snapshot()["operations"]["emotion_analysis"]["coalesced"]
+        < coalesced + FOLLOWERS
+    ):
+        await asyncio.sleep(0.01)
+
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    assert leader.cancelled()
+
+    gate.set()
+    logs = await asyncio.wait_for(asyncio.gather(*followers), 10)
+    # 共有の処理が使った接続もプールに返っている
+    return [log.analysis for log in logs], async_engine.pool.checkedout()
+
+
+def test_followers_finish_after_leader_is_cancelled(client, monkeypatch):
+    r = client.post(
+        "/api/v1/diaries/", json={"content": "相乗りのテスト用の日記", "tension": 10}
+    )
+    assert r.status_code == 201, r.text
+    diary_id = r.json()["id"]
+
+    gate = client.portal.call(asyncio.Event)
+    started = client.portal.call(asyncio.Event)
+    original_create = _FakeCompletions.create
+
+    async def gated_create(self, **kwargs):
+        started.set()
+        await gate.wait()
+        return await original_create(self, **kwargs)
+
+    monkeypatch.setattr(_FakeCompletions, "create", gated_create)
+    cache_rows = _cache_rows()
+
+    analyses, checked_out = client.portal.call(_cancel_leader, diary_id, gate, started)
+
+    assert len(analyses) == FOLLOWERS
+    assert analyses[0] and len(set(analyses)) == 1
+    assert checked_out == 0
+    # 共有の処理が書いた応答キャッシュはキャンセルされたリクエストと一緒に消えない
+    assert _cache_rows() == cache_rows + 1
+    with Session(engine) as db:
+        log = db.scalar(select(EmotionLog).where(EmotionLog.diary_id == diary_id))
+        assert log.analysis == analyses[0]
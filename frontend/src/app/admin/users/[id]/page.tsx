@@ -18,7 +18,7 @@ export default function UserDetailPage() {
     const fetchDiaries = async () => {
       try {
         const data = await getUserDiaries(userId);
-        setDiaries(data);
+        setDiaries(data.items);
       } catch (err) {
         setError(
           err instanceof Error ? err.message : "日記の取得に失敗しました"
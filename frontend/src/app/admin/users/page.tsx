@@ -13,7 +13,7 @@ export default function AdminUsersPage() {
     const fetchUsers = async () => {
       try {
         const data = await getAllUsers();
-        setUsers(data);
+        setUsers(data.items);
       } catch (err) {
         setError(
           err instanceof Error ? err.message : "ユーザーの取得に失敗しました"
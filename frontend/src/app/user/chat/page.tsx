@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef } from "react";
 import {
-  sendMessage,
+  streamMessage,
   getLocalHistory,
   syncHistoryFromDB,
   clearHistory,
@@ -51,16 +51,22 @@ export default function ChatPage() {
     setMessages((prev) => [...prev, tempUserMsg]);
 
     try {
-      // API呼び出し
-      const reply = await sendMessage(userMessage);
-
-      // AI返答を追加
-      const assistantMsg: ChatMessage = {
-        role: "assistant",
-        content: reply,
-        created_at: new Date().toISOString(),
-      };
-      setMessages((prev) => [...prev, assistantMsg]);
+      // ストリーミングで返答を受け取り、届いた分から表示する
+      const createdAt = new Date().toISOString();
+      let started = false;
+      await streamMessage(userMessage, (reply) => {
+        const assistantMsg: ChatMessage = {
+          role: "assistant",
+          content: reply,
+          created_at: createdAt,
+        };
+        setMessages((prev) =>
+          started
+            ? [...prev.slice(0, -1), assistantMsg]
+            : [...prev, assistantMsg]
+        );
+        started = true;
+      });
     } catch (error) {
       console.error("Failed to send message:", error);
 
@@ -177,7 +183,7 @@ export default function ChatPage() {
                 </div>
               </div>
             ))}
-            {loading && (
+            {loading && messages[messages.length - 1]?.role === "user" && (
               <div className="flex justify-start">
                 <div className="bg-white border-2 border-pink-100 p-4 rounded-2xl">
                   <div className="flex items-center gap-2">
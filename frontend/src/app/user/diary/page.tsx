@@ -14,7 +14,7 @@ export default function DiaryListPage() {
     const fetchDiaries = async () => {
       try {
         const data = await getDiaries();
-        setDiaries(data);
+        setDiaries(data.items);
       } catch (err) {
         setError(
           err instanceof Error ? err.message : "日記の読み込みに失敗しました"
@@ -25,6 +25,11 @@ export interface AdminDiary {
   };
 }
 
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
 export interface AdminStats {
   total_users: number;
   total_diaries: number;
@@ -33,12 +38,21 @@ export interface AdminStats {
   weekly_diaries: number;
 }
 
+function pageQuery(cursor: string | undefined, limit: number): string {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
+  return params.toString();
+}
+
 /**
  * 全ユーザーを取得
  */
-export async function getAllUsers(skip = 0, limit = 100): Promise<User[]> {
+export async function getAllUsers(
+  cursor?: string,
+  limit = 100
+): Promise<Page<User>> {
   const response = await fetch(
-    `${API_BASE_URL}/api/v1/admin/users?skip=${skip}&limit=${limit}`
+    `${API_BASE_URL}/api/v1/admin/users?${pageQuery(cursor, limit)}`
   );
 
   if (!response.ok) {
@@ -53,11 +67,11 @@ export async function getAllUsers(skip = 0, limit = 100): Promise<User[]> {
  */
 export async function getUserDiaries(
   userId: number,
-  skip = 0,
+  cursor?: string,
   limit = 50
-): Promise<AdminDiary[]> {
+): Promise<Page<AdminDiary>> {
   const response = await fetch(
-    `${API_BASE_URL}/api/v1/admin/users/${userId}/diaries?skip=${skip}&limit=${limit}`
+    `${API_BASE_URL}/api/v1/admin/users/${userId}/diaries?${pageQuery(cursor, limit)}`
   );
 
   if (!response.ok) {
@@ -71,11 +85,11 @@ export async function getUserDiaries(
  * 全日記を取得
  */
 export async function getAllDiaries(
-  skip = 0,
+  cursor?: string,
   limit = 100
-): Promise<AdminDiary[]> {
+): Promise<Page<AdminDiary>> {
   const response = await fetch(
-    `${API_BASE_URL}/api/v1/admin/diaries?skip=${skip}&limit=${limit}`
+    `${API_BASE_URL}/api/v1/admin/diaries?${pageQuery(cursor, limit)}`
   );
 
   if (!response.ok) {
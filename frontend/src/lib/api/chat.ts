@@ -15,6 +15,11 @@ export interface ChatMessageResponse {
   created_at: string;
 }
 
+export interface ChatHistoryResponse {
+  items: ChatMessageResponse[];
+  next_cursor: string | null;
+}
+
 export interface ChatResponse {
   reply: string;
   message_id: number;
@@ -60,7 +65,7 @@ export async function sendMessage(
   content: string,
   userId: number = 1
 ): Promise<string> {
-  // localStorageから履歴取得
+  // localStorageの履歴（表示用）。会話の文脈はサーバ側でDBから組み立てるので送信しない
   const history = getLocalHistory();
 
   const response = await fetch(
@@ -68,10 +73,7 @@ export async function sendMessage(
     {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        content,
-        history, // localStorageの履歴を送信
-      }),
+      body: JSON.stringify({ content }),
     }
   );
 
@@ -97,6 +99,77 @@ export async function sendMessage(
   return data.reply;
 }
 
+/**
+ * メッセージを送信し、AIの返答をストリーミングで受け取る
+ * onDelta には返答の断片が届くたびに、それまでの返答全体が渡される
+ */
+export async function streamMessage(
+  content: string,
+  onDelta: (reply: string) => void,
+  userId: number = 1,
+  signal?: AbortSignal
+): Promise<string> {
+  const history = getLocalHistory();
+
+  const response = await fetch(
+    `${API_BASE_URL}/api/v1/chat/stream?user_id=${userId}`,
+    {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ content }),
+      signal,
+    }
+  );
+
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || "メッセージの送信に失敗しました");
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let reply = "";
+  let done = false;
+
+  while (!done) {
+    const chunk = await reader.read();
+    if (chunk.done) break;
+    buffer += decoder.decode(chunk.value, { stream: true });
+
+    // SSE のイベントは空行区切り
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}");
+      if (event === "delta") {
+        reply += data.content;
+        onDelta(reply);
+      } else if (event === "error") {
+        throw new Error(data.detail);
+      } else if (event === "done") {
+        done = true;
+      }
+    }
+  }
+
+  const updatedHistory: ChatMessage[] = [
+    ...history,
+    { role: "user", content, created_at: new Date().toISOString() },
+    {
+      role: "assistant",
+      content: reply,
+      created_at: new Date().toISOString(),
+    },
+  ];
+  saveLocalHistory(updatedHistory);
+
+  return reply;
+}
+
 /**
  * DBから履歴を同期（ページロード時など）
  */
@@ -112,8 +185,8 @@ export async function syncHistoryFromDB(
       throw new Error("履歴の取得に失敗しました");
     }
 
-    const messages: ChatMessageResponse[] = await response.json();
-    const chatMessages: ChatMessage[] = messages.map((msg) => ({
+    const data: ChatHistoryResponse = await response.json();
+    const chatMessages: ChatMessage[] = data.items.map((msg) => ({
       role: msg.role as "user" | "assistant",
       content: msg.content,
       created_at: msg.created_at,
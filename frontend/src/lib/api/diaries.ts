@@ -12,6 +12,11 @@ export interface Diary {
   updated_at: string;
 }
 
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
 export interface FlowerImage {
   id: number;
   diary_id: number;
@@ -84,12 +89,15 @@ export async function createDiary(
 }
 
 /**
- * 日記一覧を取得
+ * 日記一覧を取得（cursor に前ページの next_cursor を渡すと続きを取得）
  */
-export async function getDiaries(skip = 0, limit = 10): Promise<Diary[]> {
-  const response = await fetch(
-    `${API_BASE_URL}/api/v1/diaries/?skip=${skip}&limit=${limit}`
-  );
+export async function getDiaries(
+  cursor?: string,
+  limit = 10
+): Promise<Page<Diary>> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${API_BASE_URL}/api/v1/diaries/?${params}`);
 
   if (!response.ok) {
     throw new Error("日記の取得に失敗しました");
@@ -143,26 +151,77 @@ export async function getDiaryCount(): Promise<number> {
   }
 }
 
+export interface FlowerJob {
+  job_id: number;
+  diary_id: number;
+  status: "queued" | "running" | "done" | "failed";
+  flower_image_id: number | null;
+  image_url: string | null;
+  error: string | null;
+  created_at: string;
+  finished_at: string | null;
+}
+
+/**
+ * 花画像の生成ジョブの状態を取得
+ */
+export async function getFlowerJob(
+  jobId: number,
+  userId: number = 1
+): Promise<FlowerJob> {
+  const response = await fetch(
+    `${API_BASE_URL}/api/v1/flowers/jobs/${jobId}?user_id=${userId}`
+  );
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || "生成状況の取得に失敗しました");
+  }
+
+  return response.json();
+}
+
 /**
- * 日記の花画像を生成
+ * 日記の花画像を生成（ジョブを登録し、完了するまで状態を確認する）
  */
 export async function generateFlowerImage(
-  diaryId: number
+  diaryId: number,
+  userId: number = 1,
+  pollIntervalMs: number = 1500
 ): Promise<FlowerImage> {
-  const response = await fetch(`${API_BASE_URL}/api/v1/flowers/generate`, {
-    method: "POST",
-    headers: {
-      "Content-Type": "application/json",
-    },
-    body: JSON.stringify({ diary_id: diaryId }),
-  });
+  const response = await fetch(
+    `${API_BASE_URL}/api/v1/flowers/generate?user_id=${userId}`,
+    {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ diary_id: diaryId }),
+    }
+  );
 
   if (!response.ok) {
     const error = await response.json();
     throw new Error(error.detail || "画像の生成に失敗しました");
   }
 
-  return response.json();
+  let job: FlowerJob = await response.json();
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+    job = await getFlowerJob(job.job_id, userId);
+  }
+
+  if (job.status === "failed" || job.flower_image_id === null) {
+    throw new Error(job.error || "画像の生成に失敗しました");
+  }
+
+  const imageResponse = await fetch(
+    `${API_BASE_URL}/api/v1/flowers/${job.flower_image_id}?user_id=${userId}`
+  );
+  if (!imageResponse.ok) {
+    throw new Error("画像の取得に失敗しました");
+  }
+  return imageResponse.json();
 }
 
 /**